@@ -1,20 +1,143 @@
-from typing import Dict, Any, List, Callable, Optional, Tuple, Literal
+from typing import Dict, Any, List, Callable, Optional, Tuple, Literal, Union
 from uuid import UUID
 import re
 import json
+import logging
+import orjson
 import inspect
-from datetime import datetime, timezone
+import sys
+import asyncio
+import hashlib
+import time
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from fastapi import HTTPException
 from json_repair import repair_json
 
 from app.agents.models import Action, Message
-from app.agents.model_providers import OpenAIProvider, AnthropicProvider, GoogleProvider, GrokProvider, RetryConfig, get_fallback_providers, is_provider_available, create_fallback_provider
-from app.agents.prompt_templates import build_system_prompt
+from app.agents.model_providers import ModelProvider, OpenAIProvider, AnthropicProvider, GoogleProvider, GrokProvider, RetryConfig, get_fallback_providers, is_provider_available, create_fallback_provider, generate_response_hedged, is_provider_circuit_open, min_cacheable_tokens
+from app.agents.prompt_templates import build_system_prompt, apply_history_cache_control
+from app.services.semantic_search import semantic_search_service
+from app.services.semantic_response_cache import semantic_response_cache
 from app.utils.logging.component_loggers import get_agent_logger, log_agent_event
 from app.config import INTELLIGENCE_MODEL_MAP, USE_ONE_HOUR_CACHE
 
 load_dotenv()
 
+# Action sets up to this size are matched with str.find scans instead of a regex alternation
+_LITERAL_SCAN_MAX_ACTIONS = 8
+
+
+def _is_word_char(char: str) -> bool:
+    """Same character class as the regex \\w, used for word-boundary checks."""
+    return char.isalnum() or char == '_'
+
+
+# Actions between increment_request_turns_by flushes; remaining turns are written when query() exits
+_TURN_INCREMENT_FLUSH_INTERVAL = 4
+
+# Seconds between background cancellation checks while query() runs; each check is a
+# database round trip, so this trades cancellation latency against query load
+_CANCELLATION_POLL_INTERVAL = 1.5
+# While the check keeps failing, the poll interval doubles up to this cap
+_CANCELLATION_POLL_MAX_BACKOFF = 10.0
+
+# Maximum tool handlers running at once across all agents when a turn requests several actions
+_TOOL_CONCURRENCY = 8
+_tool_semaphore = asyncio.Semaphore(_TOOL_CONCURRENCY)
+
+# Maximum characters of step content stored per mas_logs row
+_MAS_LOG_CONTENT_LIMIT = 10000
+
+# Placeholder the model uses to have the last observation embedded verbatim in its response
+_OBSERVATION_MARKER = "$$$observation$$$"
+_OBSERVATION_MARKER_LEN = len(_OBSERVATION_MARKER)
+
+# Marker the Chat Agent carries through to its final response once settings were updated
+_SETTINGS_MARKER = "[SETTINGS_UPDATED]"
+
+# Keys every conversation-history message dict must carry
+_REQUIRED_MESSAGE_KEYS = frozenset(('role', 'content', 'type'))
+
+
+# Interned role values shared by every history message built here
+_ROLE_SYSTEM = sys.intern("system")
+_ROLE_USER = sys.intern("user")
+_ROLE_ASSISTANT = sys.intern("assistant")
+
+
+def _text_message(role: str, content: Any) -> Dict[str, Any]:
+    """Build a plain-text history message in the dict shape every provider consumes."""
+    return {"role": role, "content": content, "type": "text"}
+
+
+def _message_to_dict(message: Message) -> Dict[str, Any]:
+    """Copy a Message's fields into a dict; same result as model_dump() since all fields are scalars."""
+    return message.__dict__.copy()
+
+
+def _last_user_content(messages: Any) -> str:
+    """Return the content of the last user message in a message, dict, or list of them ("" if none)."""
+    candidates = reversed(messages) if isinstance(messages, list) else (messages,)
+    return next((
+        msg.content if isinstance(msg, Message) else msg.get('content', '')
+        for msg in candidates
+        if (msg.role == "user" if isinstance(msg, Message) else isinstance(msg, dict) and msg.get('role') == 'user')
+    ), "")
+
+
+# Legacy "Thought:/Action:/Response:" parsing patterns
+_THOUGHT_RE = re.compile(r'^(?:\d*\.?\s*)?(?:thought|thinking):\s*(.*?)(?=^(?:\d*\.?\s*)?(?:action|response):|\Z)', re.MULTILINE | re.IGNORECASE | re.DOTALL)
+_ACTION_RE = re.compile(r'^(?:\d*\.?\s*)?action:\s*(\w+):\s*(.*?)(?=^(?:\d*\.?\s*)?(?:observation|response|thought):|\Z)', re.MULTILINE | re.IGNORECASE | re.DOTALL)
+_RESPONSE_RE = re.compile(r'^(?:\d*\.?\s*)?response:\s*(.*?)(?=^(?:\d*\.?\s*)?(?:thought|action):|\Z)', re.MULTILINE | re.IGNORECASE | re.DOTALL)
+
+# Stop instructions some models echo back; stripped before the response is used
+_STOP_MARKERS_RE = re.compile("|".join(re.escape(marker) for marker in (
+    "STOP HERE - You will be called again with the action result.",
+    "Stop your output here and you will be called again with the result of the action as an \"Observation\".",
+)))
+
+# JSON extraction fallbacks
+_JSON_FENCE_RE = re.compile(r'```json\s*(\{.*\})\s*```', re.DOTALL)
+_JSON_DECODER = json.JSONDecoder()
+_JSON_BRACE_RE = re.compile(r'(\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\})', re.DOTALL)
+
+
+def _find_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced {...} object in text, or None.
+
+    Linear scan that tracks brace depth while skipping over string literals
+    (and escapes inside them), so it cannot backtrack on long responses.
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+
+    return None
+
 
 """
 Utility functions for model and provider management.
@@ -23,6 +146,27 @@ Utility functions for model and provider management.
 from typing import Optional
 
 
+# Ordered (keyword, provider) pairs; first match wins, so "grok" must precede
+# the OpenAI keywords.
+_PROVIDER_KEYWORDS = (
+    ("grok", "xai"),
+    ("o3", "openai"),
+    ("gpt", "openai"),
+    ("claude", "anthropic"),
+    ("gemini", "google"),
+)
+
+
+# Provider name -> ModelProvider class used to serve it
+_PROVIDER_CLASSES = {
+    "openai": OpenAIProvider,
+    "anthropic": AnthropicProvider,
+    "xai": GrokProvider,
+    "google": GoogleProvider,
+}
+
+
+@lru_cache(maxsize=512)
 def get_provider_from_model(model: str) -> str:
     """
     Determine the provider name from a model name.
@@ -40,27 +184,13 @@ def get_provider_from_model(model: str) -> str:
         raise ValueError("Model name cannot be empty")
     
     model_lower = model.lower()
-    
-    # Check for x.ai/Grok models
-    if "grok" in model_lower:
-        return "xai"
-    
-    # Check for OpenAI models (o3, gpt)
-    elif "o3" in model_lower or "gpt" in model_lower:
-        return "openai"
-    
-    # Check for Anthropic models (claude)
-    elif "claude" in model_lower:
-        return "anthropic"
-    
-    # Check for Google models (gemini)
-    elif "gemini" in model_lower:
-        return "google"
-    
-    else:
+    provider = next((p for keyword, p in _PROVIDER_KEYWORDS if keyword in model_lower), None)
+    if provider is None:
         raise ValueError(f"Unsupported model: {model}")
+    return provider
 
 
+@lru_cache(maxsize=512)
 def is_valid_model_for_provider(model: str, provider: str) -> bool:
     """
     Check if a model is valid for a given provider.
@@ -79,6 +209,23 @@ def is_valid_model_for_provider(model: str, provider: str) -> bool:
         return False 
 
 
+@lru_cache(maxsize=1)
+def _resolve_cancellation_check() -> Optional[Callable]:
+    """
+    Resolve check_cancellation_request once per process.
+
+    Imported lazily because primary_agent imports this module.
+
+    Returns:
+        The cancellation check function, or None if it is not available
+    """
+    try:
+        from app.agents.primary_agent.primary_agent import check_cancellation_request
+        return check_cancellation_request
+    except ImportError:
+        # check_cancellation_request not available, skip cancellation checking
+        return None
+
 
 class BaseAgent:
     def __init__(
@@ -95,7 +242,11 @@ class BaseAgent:
         calling_agent: str = None,
         enable_caching: bool = False,
         cache_static_content: bool = True,
-        messages: Optional[List[Message]] = None
+        cache_examples: bool = False,
+        messages: Optional[List[Message]] = None,
+        enable_semantic_cache: bool = False,
+        max_history: Optional[int] = None,
+        hedge_delay: Optional[float] = None
     ):
         """
         Initialize a base agent with customizable system prompt and actions.
@@ -113,7 +264,11 @@ class BaseAgent:
             calling_agent: Name of the agent calling this agent
             enable_caching: Whether to enable Anthropic prompt caching (only for Anthropic models)
             cache_static_content: Whether to cache static content sections
+            cache_examples: Whether custom_examples are fixed for the session and get their own cache breakpoint
             messages: Optional list of initial messages to add to conversation history
+            enable_semantic_cache: Whether to serve responses for semantically equivalent prompts from the in-process cache
+            max_history: Optional cap on history length; the oldest non-system messages are dropped beyond it
+            hedge_delay: If set, seconds to wait on the primary provider before racing a fallback provider against it
         """
         provider = get_provider_from_model(model)
 
@@ -123,37 +278,52 @@ class BaseAgent:
         # Use default retry config if none provided
         if retry_config is None:
             retry_config = RetryConfig()
+        self.retry_config = retry_config
         
         # Initialize the appropriate model provider
-        if provider == "openai":
-            self.model_provider = OpenAIProvider(model=model, retry_config=retry_config)
-        elif provider == "anthropic":
-            self.model_provider = AnthropicProvider(model=model, retry_config=retry_config)
-        elif provider == "xai":
-            self.model_provider = GrokProvider(model=model, retry_config=retry_config)
-        elif provider == "google":
-            self.model_provider = GoogleProvider(model=model, retry_config=retry_config)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        self.model_provider = self._make_provider(provider, model)
             
         # Store provider info for fallback
         self.primary_provider = provider
-        self.retry_config = retry_config
+        self.hedge_delay = hedge_delay
+        self._hedge_provider = None  # Backup provider raced against the primary, created on first hedge
             
         self.temperature = temperature
         self.agent_name = agent_name
         self.calling_agent = calling_agent
         self.settings_updated = False  # Track if Config Agent updated settings
         self._last_observation = None  # Store the most recent observation for embedding
-        self._log_sequence_counter = 0  # Counter for ensuring proper log ordering within milliseconds
+        self._current_thought: Optional[str] = None  # Parsed thought awaiting MAS logging
+        self._current_action: Optional[Dict[str, Any]] = None  # Parsed action awaiting MAS logging
+        # MAS log timestamps: wall-clock anchor plus monotonic elapsed time, so entries stay strictly ordered
+        self._log_base_time = datetime.now(timezone.utc)
+        self._log_base_ns = time.monotonic_ns()
+        self._last_log_offset_us = -1
+        self._mas_log_buffer: List[Dict[str, Any]] = []  # Pending mas_logs rows, flushed once per turn
+        self._cancelled = False  # Set by the background cancellation poller in query()
+        self._pending_turn_increments = 0  # Request turns not yet written via increment_request_turns_by
 
         # Create logger with actual agent name
         self.logger = get_agent_logger(self.agent_name, __name__)
         
         all_actions = actions
         self.actions = {action.name: action for action in all_actions}  # Store actions by name
-
+        # Action set is fixed for the agent's lifetime: precompute one table holding exact and
+        # lowercased names -> (canonical name, Action). Lowercased entries are added in reverse so
+        # the first-registered name wins on collisions, and exact names always take precedence.
+        action_table = {name.lower(): (name, action) for name, action in reversed(self.actions.items())}
+        action_table.update((name, (name, action)) for name, action in self.actions.items())
+        self._lookup_action = action_table.get
+        # Detects mentions of any action name in responses that could not be parsed; small action
+        # sets use plain substring scans (see _mentions_action), larger ones the compiled alternation
+        self._action_names_folded = tuple(name.casefold() for name in self.actions)
+        self._action_pattern = None
+        if len(self.actions) > _LITERAL_SCAN_MAX_ACTIONS:
+            self._action_pattern = re.compile(r'\b(?:' + '|'.join(map(re.escape, self.actions)) + r')\b', re.IGNORECASE)
+
+        self._has_settings_marker = False  # Set once any history message carries _SETTINGS_MARKER
         self.messages = []
+        self.max_history = max_history
         # Add initial messages if provided
         if messages:
             self.add_message(messages)
@@ -164,80 +334,97 @@ class BaseAgent:
         # Determine if caching should be enabled (only for Anthropic models)
         use_caching = enable_caching and provider == "anthropic"
         self.use_caching = use_caching  # Store for later use in observation messages
+        self.enable_semantic_cache = enable_semantic_cache
+        self._semantic_cache_namespace = None  # Set per query so cached responses never cross users
         
+        # The system prompt is built lazily on the first execute() (or ahead of time via
+        # prepare_system_prompt) and inserted where it would have been appended here
+        self._system_prompt_kwargs = {
+            "actions": all_actions,
+            "additional_context": additional_context,
+            "general_instructions": general_instructions,
+            "examples": custom_examples,
+            "calling_agent": calling_agent,
+            "enable_caching": use_caching,
+            "cache_static_content": cache_static_content,
+            "cache_examples": cache_examples,
+            "min_cacheable_tokens": min_cacheable_tokens(model),
+        }
+        self._system_prompt_index = len(self.messages)
+        self._system_prompt_installed = False
+
+    def _install_system_prompt(self, system_prompt: Union[str, List[Dict[str, Any]], None] = None) -> None:
+        """Build the system prompt (unless already built), log it, and insert it into the history once."""
+        if self._system_prompt_installed:
+            return
+        self._system_prompt_installed = True
+
         # Create the system prompt using the template
-        system_prompt = build_system_prompt(
-            actions=all_actions,
-            additional_context=additional_context,
-            general_instructions=general_instructions,
-            examples=custom_examples,
-            calling_agent=calling_agent,
-            enable_caching=use_caching,
-            cache_static_content=cache_static_content
-        )
-        
+        if system_prompt is None:
+            system_prompt = build_system_prompt(**self._system_prompt_kwargs)
+
         # Log the full system prompt and agent initialization
         # For cached prompts, provide verbose logging with cache indicators
-        log_prompt = system_prompt
-        if isinstance(system_prompt, list):
-            # Build verbose log for cached prompt with clear cache indicators
-            prompt_sections = []
-            for i, section in enumerate(system_prompt):
-                if isinstance(section, dict):
-                    text = section.get("text", "")
-                    has_cache = section.get("cache_control") is not None
+        # Skipped entirely when INFO is disabled so the prompt copy is never built
+        if self.logger.isEnabledFor(logging.INFO):
+            log_prompt = system_prompt
+            if isinstance(system_prompt, list):
+                # Build verbose log for cached prompt with clear cache indicators
+                prompt_sections = []
+                for i, section in enumerate(system_prompt):
+                    if isinstance(section, dict):
+                        text = section.get("text", "")
+                        has_cache = section.get("cache_control") is not None
                     
-                    # Add cache indicator prefix if this section is cached
-                    if has_cache:
-                        cache_type = section.get("cache_control", {}).get("type", "unknown")
-                        prompt_sections.append(f"[CACHED:{cache_type.upper()}]\n{text}")
-                    else:
-                        prompt_sections.append(f"[UNCACHED]\n{text}")
+                        # Add cache indicator prefix if this section is cached
+                        if has_cache:
+                            cache_type = section.get("cache_control", {}).get("type", "unknown")
+                            prompt_sections.append(f"[CACHED:{cache_type.upper()}]\n{text}")
+                        else:
+                            prompt_sections.append(f"[UNCACHED]\n{text}")
             
-            # Join all sections with clear separators
-            log_prompt = "\n\n" + "="*50 + "\n\n".join(prompt_sections)
-            self.logger.info(f"{agent_name} using CACHED system prompt with {len(system_prompt)} sections")
-        else:
-            self.logger.info(f"{agent_name} using standard (uncached) system prompt")
+                # Join all sections with clear separators
+                log_prompt = "\n\n" + "="*50 + "\n\n".join(prompt_sections)
+                self.logger.info(f"{self.agent_name} using CACHED system prompt with {len(system_prompt)} sections")
+            else:
+                self.logger.info(f"{self.agent_name} using standard (uncached) system prompt")
             
-        log_agent_event(
-            self.logger,
-            f"{agent_name} initialized with system prompt",
-            agent_name=agent_name,
-            action="agent_initialization",
-            model=model,
-            temperature=temperature,
-            max_turns=max_turns,
-            actions_count=len(all_actions),
-            system_prompt=log_prompt,
-            caching_enabled=use_caching
-        )
+            log_agent_event(
+                self.logger,
+                f"{self.agent_name} initialized with system prompt",
+                agent_name=self.agent_name,
+                action="agent_initialization",
+                model=self.model,
+                temperature=self.temperature,
+                max_turns=self.max_turns,
+                actions_count=len(self.actions),
+                system_prompt=log_prompt,
+                caching_enabled=self.use_caching
+            )
         
         # Initialize with system prompt
         if system_prompt:
-            self.messages.append({
-                "role": "system",
-                "content": system_prompt,
-                "type": "text"
-            })
+            self.messages.insert(self._system_prompt_index, _text_message(_ROLE_SYSTEM, system_prompt))
+
+    async def prepare_system_prompt(self) -> None:
+        """Build the system prompt in a worker thread ahead of the first execute()."""
+        if not self._system_prompt_installed:
+            system_prompt = await asyncio.to_thread(build_system_prompt, **self._system_prompt_kwargs)
+            self._install_system_prompt(system_prompt)
 
-    def _log_mas_step(self, log_type: str, content: str, user_id: UUID, request_id: str,
+    def _log_mas_step(self, log_type: str, content: str, user_id: Union[UUID, str], request_id: str,
                       turn: int, supabase, action_name: str = None,
                       action_params: dict = None, metadata: dict = None):
-        """Log a MAS step to the database with explicit timestamp for proper ordering."""
+        """Buffer a MAS step log with explicit timestamp for proper ordering; written by _flush_mas_logs."""
         if not supabase or not request_id:
             return
 
         try:
             # Generate application-level timestamp for consistent ordering
-            # Use seconds precision with sequence counter for rapid sequential logs
-            self._log_sequence_counter += 1
-            base_timestamp = datetime.now(timezone.utc)
-
-            # Add seconds offset for logs within the same second to maintain ordering
-            timestamp_with_sequence = base_timestamp.replace(
-                second=(base_timestamp.second + self._log_sequence_counter) % 60
-            )
+            # Bump by 1µs when two logs land in the same microsecond so ordering stays strict
+            offset_us = max((time.monotonic_ns() - self._log_base_ns) // 1000, self._last_log_offset_us + 1)
+            self._last_log_offset_us = offset_us
+            timestamp_with_sequence = self._log_base_time + timedelta(microseconds=offset_us)
 
             log_data = {
                 'request_id': request_id,
@@ -245,7 +432,7 @@ class BaseAgent:
                 'type': log_type,
                 'turn': turn,
                 'agent_name': self.agent_name,
-                'content': content[:10000],  # Limit content length
+                'content': content if len(content) <= _MAS_LOG_CONTENT_LIMIT else content[:_MAS_LOG_CONTENT_LIMIT],
                 'model': self.model,
                 'action_name': action_name,
                 'action_params': action_params,
@@ -253,12 +440,68 @@ class BaseAgent:
                 'created_at': timestamp_with_sequence.isoformat()  # Explicit timestamp
             }
 
-            supabase.from_('mas_logs').insert(log_data).execute()
-            self.logger.debug(f"Logged MAS step: {log_type} for {self.agent_name}")
+            self._mas_log_buffer.append(log_data)
+            self.logger.debug(f"Buffered MAS step: {log_type} for {self.agent_name}")
 
         except Exception as e:
             self.logger.error(f"Failed to log MAS step {log_type}: {str(e)}")
 
+    async def _poll_cancellation(self, check_cancellation_request: Callable, request_id: str, user_id: UUID, supabase):
+        """Background task that flips self._cancelled once the request is cancelled."""
+        interval = _CANCELLATION_POLL_INTERVAL
+        failing = False
+        while not self._cancelled:
+            try:
+                if await asyncio.to_thread(check_cancellation_request, request_id, user_id, supabase):
+                    self._cancelled = True
+                    self.logger.info(f"Cancellation detected for request {request_id} in agent {self.agent_name}")
+                    return
+                if failing:
+                    self.logger.info("Cancellation check recovered for request %s", request_id)
+                    failing = False
+                    interval = _CANCELLATION_POLL_INTERVAL
+            except Exception as e:
+                # Report the first failure; back off quietly while the check keeps failing
+                if not failing:
+                    self.logger.error(f"Error checking cancellation for request {request_id}: {str(e)}")
+                    failing = True
+                else:
+                    self.logger.debug("Cancellation check still failing for request %s: %s", request_id, e)
+                interval = min(interval * 2, _CANCELLATION_POLL_MAX_BACKOFF)
+            await asyncio.sleep(interval)
+
+    def _flush_turn_increments(self, request_id: str, supabase):
+        """Apply pending request turn increments with a single RPC."""
+        pending = self._pending_turn_increments
+        if not pending or not request_id or not supabase:
+            return
+
+        self._pending_turn_increments = 0
+        try:
+            turn_result = supabase.rpc('increment_request_turns_by', {
+                'request_id_param': request_id,
+                'n_param': pending
+            }).execute()
+            if turn_result.data and turn_result.data != -1:
+                self.logger.info(f"Agent {self.agent_name} incremented turn count by {pending} to {turn_result.data} for request {request_id}")
+            else:
+                self.logger.error(f"Failed to increment turn count by {pending} for request {request_id} in agent {self.agent_name}")
+        except Exception as turn_error:
+            self.logger.error(f"Error incrementing turn count by {pending} in agent {self.agent_name}: {str(turn_error)}")
+
+    def _flush_mas_logs(self, supabase):
+        """Write all buffered MAS step logs in a single insert."""
+        if not supabase or not self._mas_log_buffer:
+            return
+
+        log_rows = self._mas_log_buffer
+        self._mas_log_buffer = []
+        try:
+            supabase.from_('mas_logs').insert(log_rows).execute()
+            self.logger.debug(f"Logged {len(log_rows)} MAS steps for {self.agent_name}")
+        except Exception as e:
+            self.logger.error(f"Failed to write {len(log_rows)} MAS step logs: {str(e)}")
+
     def upgrade_intelligence(self, required_level: int):
         """Permanently upgrade agent to required intelligence level"""
         if required_level not in INTELLIGENCE_MODEL_MAP:
@@ -266,10 +509,10 @@ class BaseAgent:
             return
             
         new_model = INTELLIGENCE_MODEL_MAP[required_level]
-        if hasattr(self, 'model') and self.model == new_model:
+        if self.model == new_model:
             return  # Already at correct level
             
-        old_model = getattr(self, 'model', 'unknown')
+        old_model = self.model
         
         # Update model and reinitialize provider
         self.model = new_model
@@ -291,21 +534,19 @@ class BaseAgent:
         provider = get_provider_from_model(self.model)
         
         # Initialize the appropriate model provider
-        if provider == "openai":
-            self.model_provider = OpenAIProvider(model=self.model, retry_config=self.retry_config)
-        elif provider == "anthropic":
-            self.model_provider = AnthropicProvider(model=self.model, retry_config=self.retry_config)
-        elif provider == "xai":
-            self.model_provider = GrokProvider(model=self.model, retry_config=self.retry_config)
-        elif provider == "google":
-            self.model_provider = GoogleProvider(model=self.model, retry_config=self.retry_config)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        self.model_provider = self._make_provider(provider, self.model)
             
         # Update provider info for fallback
         self.primary_provider = provider
+
+    def _make_provider(self, provider: str, model: str):
+        """Construct the model provider registered for the given provider name"""
+        provider_class = _PROVIDER_CLASSES.get(provider)
+        if provider_class is None:
+            raise ValueError(f"Unsupported provider: {provider}")
+        return provider_class(model=model, retry_config=self.retry_config)
     
-    def _handle_max_turns_reached(self) -> str:
+    async def _handle_max_turns_reached(self) -> str:
         """Handle max turns reached by requesting a progress summary from the agent."""
 
         # Add a message to the agent requesting a summary of progress
@@ -316,7 +557,7 @@ class BaseAgent:
 
         try:
             # Execute one final turn to get the agent's summary
-            response = self.execute()
+            response = await self.execute()
             self.logger.info(f"{self.agent_name} progress summary: {response}")
             return response
         except Exception as e:
@@ -327,20 +568,21 @@ class BaseAgent:
     def add_message(self, message: str | Dict[str, Any] | Message | List[Dict[str, Any] | Message], enable_caching: bool = False) -> None:
         """Add a message or list of messages to the conversation history."""
         if isinstance(message, list):
-            for msg in message:
-                if isinstance(msg, Message):
-                    # Convert Pydantic model to dict
-                    self.messages.append(msg.model_dump())
-                elif isinstance(msg, dict) and 'role' in msg and 'content' in msg and 'type' in msg:
-                    self.messages.append(msg)
-                else:
-                    raise ValueError("Each message must contain 'role', 'content', and 'type'.")
+            # Convert Pydantic models to dicts, then validate the batch before extending
+            batch = [_message_to_dict(msg) if isinstance(msg, Message) else msg for msg in message]
+            if not all(isinstance(msg, dict) and _REQUIRED_MESSAGE_KEYS <= msg.keys() for msg in batch):
+                raise ValueError("Each message must contain 'role', 'content', and 'type'.")
+            self.messages.extend(batch)
+            for msg in batch:
+                self._note_settings_marker(msg["content"])
         elif isinstance(message, Message):
             # Convert Pydantic model to dict
-            self.messages.append(message.model_dump())
+            self.messages.append(_message_to_dict(message))
+            self._note_settings_marker(message.content)
         elif isinstance(message, dict):
-            if 'role' in message and 'content' in message and 'type' in message:
+            if _REQUIRED_MESSAGE_KEYS <= message.keys():
                 self.messages.append(message)
+                self._note_settings_marker(message["content"])
             else:
                 raise ValueError("Message must contain 'role', 'content', and 'type'.")
         else:
@@ -362,22 +604,101 @@ class BaseAgent:
                 })
             else:
                 # Use simple content format
-                self.messages.append({
-                    "role": "user",
-                    "content": message_content,
-                    "type": "text"
-                })
+                self.messages.append(_text_message(_ROLE_USER, message_content))
+                self._note_settings_marker(message_content)
+
+    def _trim_history(self) -> None:
+        """Drop the oldest non-system messages once the history exceeds max_history."""
+        messages = self.messages
+        if self.max_history is None or len(messages) <= self.max_history:
+            return
+
+        # Drop the oldest non-system messages, then keep dropping until the retained
+        # history starts on a user turn so every provider accepts the sequence
+        excess = len(messages) - self.max_history
+        trimmed = []
+        seeking_user = True
+        dropped_before_prompt = 0
+        for i, msg in enumerate(messages):
+            role = msg["role"]
+            if role != _ROLE_SYSTEM and seeking_user:
+                if excess > 0 or role != _ROLE_USER:
+                    excess -= 1
+                    if i < self._system_prompt_index:
+                        dropped_before_prompt += 1
+                    continue
+                seeking_user = False
+            trimmed.append(msg)
+        self.messages = trimmed
+
+        # A system prompt that is not installed yet must still land at the history boundary
+        if not self._system_prompt_installed:
+            self._system_prompt_index -= dropped_before_prompt
+
+    def _note_settings_marker(self, content: Any) -> None:
+        """Record whether history text carries the settings-update marker the Chat Agent preserves."""
+        if not self._has_settings_marker and isinstance(content, str) and _SETTINGS_MARKER in content:
+            self._has_settings_marker = True
 
-    def execute(self) -> str:
+    def _apply_rolling_cache_breakpoint(self) -> List[Dict[str, Any]]:
+        """Build the request messages with a cache breakpoint on the second-to-last history message."""
+        return apply_history_cache_control(self.messages)
+
+    async def _semantic_cache_key(self) -> Tuple[Optional[str], Optional[List[float]]]:
+        """
+        Return (scope, embedding) for the semantic cache, or (None, None) when the turn is not cacheable.
+
+        Only turns answering a plain user message are cached. The scope hashes the user
+        namespace and all prior messages, so only reformulations of the same turn can hit.
+        """
+        last_message = self.messages[-1]
+        content = last_message["content"]
+        if last_message["role"] != "user" or not isinstance(content, str) or content.startswith("Observation: "):
+            return None, None
+
+        scope = hashlib.sha256(orjson.dumps(
+            [self._semantic_cache_namespace, self.model, self.messages[:-1]],
+            default=str
+        )).hexdigest()
+        try:
+            embedding = await asyncio.to_thread(semantic_search_service.generate_query_embedding, content)
+        except Exception as e:
+            self.logger.warning(f"{self.agent_name} semantic cache embedding failed: {str(e)}")
+            return None, None
+        return scope, embedding
+
+    async def execute(self) -> str:
         """Execute a single turn of conversation with the model."""
+        self._install_system_prompt()
         self.logger.info(f"{self.agent_name} generating model response with {len(self.messages)} messages")
         
-        # Try primary provider first
+        # Semantic cache: serve a previous response for an equivalent user message
+        cache_scope, cache_embedding = None, None
+        if self.enable_semantic_cache:
+            cache_scope, cache_embedding = await self._semantic_cache_key()
+            if cache_embedding is not None:
+                cached_response = semantic_response_cache.get(cache_scope, cache_embedding)
+                if cached_response is not None:
+                    self.logger.info(f"{self.agent_name} serving response from semantic cache")
+                    return cached_response
+
+        # Anthropic caching: mark the history prefix so it is served from cache on the next turn
+        messages = self._apply_rolling_cache_breakpoint() if self.use_caching else self.messages
+
+        # Try primary provider first, hedged against a fallback provider when configured
         try:
-            response = self.model_provider.generate_response(self.messages, self.temperature)
+            if self.hedge_delay is not None and self.retry_config.enable_fallback:
+                response = await generate_response_hedged(
+                    self.model_provider, messages, self.temperature,
+                    self._get_hedge_provider, self.messages, self.hedge_delay
+                )
+            else:
+                response = await self.model_provider.generate_response(messages, self.temperature)
             # Filter out the STOP HERE message that should not be visible to users
-            response = response.replace("STOP HERE - You will be called again with the action result.", "").strip()
-            response = response.replace("Stop your output here and you will be called again with the result of the action as an \"Observation\".", "").strip()
+            response = _STOP_MARKERS_RE.sub("", response).strip()
+
+            if cache_embedding is not None:
+                semantic_response_cache.put(cache_scope, cache_embedding, response)
 
             self.logger.info(f"{self.agent_name} model response:\n{response}")
             return response
@@ -386,11 +707,27 @@ class BaseAgent:
             
             # Try fallback providers if enabled
             if self.retry_config.enable_fallback:
-                return self._try_fallback_providers(e)
+                return await self._try_fallback_providers(e)
             else:
                 raise e
     
-    def _try_fallback_providers(self, original_error: Exception) -> str:
+    def _get_hedge_provider(self) -> Optional[ModelProvider]:
+        """Return the first available fallback provider to race against the primary, reusing it while its circuit is closed."""
+        if self._hedge_provider is not None and is_provider_circuit_open(self._hedge_provider.PROVIDER_NAME):
+            self._hedge_provider = None
+        if self._hedge_provider is None:
+            for provider_name in get_fallback_providers():
+                if provider_name == self.primary_provider or not is_provider_available(provider_name):
+                    continue
+                if is_provider_circuit_open(provider_name):
+                    continue
+                self._hedge_provider = create_fallback_provider(provider_name, self.retry_config)
+                if self._hedge_provider is not None:
+                    self.logger.info(f"{self.agent_name} hedging {self.primary_provider} with {provider_name}")
+                    break
+        return self._hedge_provider
+
+    async def _try_fallback_providers(self, original_error: Exception) -> str:
         """Try fallback providers when primary provider fails"""
         fallback_providers = get_fallback_providers()
         
@@ -402,6 +739,9 @@ class BaseAgent:
             if not is_provider_available(provider_name):
                 self.logger.info(f"Skipping {provider_name} fallback - API key not configured")
                 continue
+            if is_provider_circuit_open(provider_name):
+                self.logger.info(f"Skipping {provider_name} fallback - circuit breaker open")
+                continue
                 
             try:
                 self.logger.info(f"{self.agent_name} trying fallback provider: {provider_name}")
@@ -411,7 +751,7 @@ class BaseAgent:
                     self.logger.warning(f"Failed to create {provider_name} fallback provider")
                     continue
                     
-                response = fallback_provider.generate_response(self.messages, self.temperature)
+                response = await fallback_provider.generate_response(self.messages, self.temperature)
                 self.logger.info(f"{self.agent_name} fallback provider {provider_name} succeeded")
                 return response
                 
@@ -423,6 +763,26 @@ class BaseAgent:
         self.logger.error(f"{self.agent_name} all providers failed, raising original error")
         raise original_error
 
+    def _resolve_action(self, action_name: str) -> Optional[Tuple[str, Action]]:
+        """Resolve an action name exactly, then case-insensitively, to (canonical name, Action)."""
+        return self._lookup_action(action_name) or self._lookup_action(action_name.lower())
+
+    def _mentions_action(self, result: str) -> bool:
+        """Check whether any action name appears as a whole word (case-insensitive) in result."""
+        if self._action_pattern is not None:
+            return self._action_pattern.search(result) is not None
+
+        result_folded = result.casefold()
+        result_len = len(result_folded)
+        for name in self._action_names_folded:
+            start = result_folded.find(name)
+            while start != -1:
+                end = start + len(name)
+                if (start == 0 or not _is_word_char(result_folded[start - 1])) and (end == result_len or not _is_word_char(result_folded[end])):
+                    return True
+                start = result_folded.find(name, start + 1)
+        return False
+
     async def _execute_action_handler(self, action: Action, action_input: str) -> str:
         """Execute an action handler, handling both sync and async handlers."""
         # Call the handler first
@@ -434,6 +794,43 @@ class BaseAgent:
         else:
             return result
 
+    async def _execute_action_batch(self, batch: List[Dict[str, Any]]) -> tuple[Optional[str], Optional[str]]:
+        """Run several independent actions from one turn concurrently, keeping their order in the observation."""
+        resolved_batch = []
+        for action_data in batch:
+            if not isinstance(action_data, dict) or "name" not in action_data:
+                raise ValueError("Missing action name")
+            resolved = self._resolve_action(action_data["name"])
+            if resolved is None:
+                return f"Unknown action: {action_data['name']}. Available: {', '.join(self.actions.keys())}", None
+            resolved_batch.append((resolved[0], resolved[1], action_data.get("parameters", {})))
+
+        action_names = [action_name for action_name, _, _ in resolved_batch]
+        self.logger.info(f"{self.agent_name} processing {len(resolved_batch)} actions concurrently: {', '.join(action_names)}")
+
+        # Store action info for logging later when we have turn number
+        self._current_action = {
+            'name': ", ".join(action_names),
+            'params': {'actions': [{'name': action_name, 'parameters': action_params}
+                                   for action_name, _, action_params in resolved_batch]}
+        }
+
+        async def run_one(action: Action, action_params: Dict[str, Any]) -> str:
+            async with _tool_semaphore:
+                return await self._execute_action_handler(action, json.dumps(action_params) if action_params else "{}")
+
+        results = await asyncio.gather(
+            *(run_one(action, action_params) for _, action, action_params in resolved_batch),
+            return_exceptions=True
+        )
+
+        sections = []
+        for index, (action_name, result) in enumerate(zip(action_names, results), 1):
+            if isinstance(result, Exception):
+                result = f"Error executing {action_name}: {str(result)}"
+            sections.append(f"[{index}] {action_name}:\n{result}")
+        return None, "Observation: " + "\n\n".join(sections)
+
     def _process_observation_embedding(self, response: str, observation: str) -> str:
         """
         Process response to embed observation content where $$$observation$$$ marker is found.
@@ -448,20 +845,28 @@ class BaseAgent:
         if not response or not observation:
             return response
 
+        # Single scan for the first marker; the common no-marker case stops here
+        marker_index = response.find(_OBSERVATION_MARKER)
+        if marker_index == -1:
+            return response
+
         # Clean up the observation content - remove "Observation: " prefix if present
         clean_observation = observation
         if clean_observation.startswith("Observation: "):
             clean_observation = clean_observation[13:]  # Remove "Observation: " (13 characters)
 
         # Replace all occurrences of the marker with the observation content
-        if "$$$observation$$$" in response:
-            self.logger.info(f"{self.agent_name} embedding observation into response")
-            response = response.replace("$$$observation$$$", clean_observation)
+        self.logger.info(f"{self.agent_name} embedding observation into response")
+        tail = response[marker_index + _OBSERVATION_MARKER_LEN:]
+        return response[:marker_index] + clean_observation + tail.replace(_OBSERVATION_MARKER, clean_observation)
 
-        return response
+    def _extract_json_string(self, result: str) -> Union[str, Dict[str, Any]]:
+        """
+        Extract JSON string from response, handling markdown code blocks.
 
-    def _extract_json_string(self, result: str) -> str:
-        """Extract JSON string from response, handling markdown code blocks."""
+        JSON embedded in surrounding prose is decoded in place with raw_decode and
+        returned as an already-parsed dict; every other path returns the JSON text.
+        """
         # First try: strip markdown code block if present
         result_stripped = result.strip()
 
@@ -479,18 +884,32 @@ class BaseAgent:
             return result_stripped.strip()
 
         # Fallback: try regex patterns
-        json_match = re.search(r'```json\s*(\{.*\})\s*```', result, re.DOTALL)
+        json_match = _JSON_FENCE_RE.search(result)
         if json_match:
             return json_match.group(1)
 
-        # Try to find JSON-like content without markdown
-        json_match = re.search(r'(\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\})', result, re.DOTALL)
+        # Try to find JSON-like content without markdown, decoding it in the same pass
+        start = result.find('{')
+        if start != -1:
+            try:
+                decoded, _ = _JSON_DECODER.raw_decode(result, start)
+                if isinstance(decoded, dict):
+                    return decoded
+            except json.JSONDecodeError:
+                pass
+
+        # Malformed JSON: return the balanced span so it can be repaired
+        json_object = _find_json_object(result)
+        if json_object:
+            return json_object
+
+        json_match = _JSON_BRACE_RE.search(result)
         if json_match:
             return json_match.group(1)
 
         raise ValueError("No JSON found in response")
 
-    def _retry_json_with_llm(self, original_result: str, error_message: str) -> str:
+    async def _retry_json_with_llm(self, original_result: str, error_message: str) -> str:
         """Ask the LLM to fix its malformed JSON response."""
         retry_prompt = f"""Your previous response contained invalid JSON that could not be parsed.
 
@@ -503,14 +922,11 @@ Please provide ONLY a corrected JSON response with the exact same content, but w
 Do not include any explanation - just the corrected JSON wrapped in ```json``` code blocks."""
 
         # Add retry message to conversation
-        self.messages.append({
-            "role": "user",
-            "content": retry_prompt,
-            "type": "text"
-        })
+        self.messages.append(_text_message(_ROLE_USER, retry_prompt))
+        self._note_settings_marker(retry_prompt)
 
         # Get corrected response from model
-        retry_response = self.execute()
+        retry_response = await self.execute()
 
         return retry_response
 
@@ -526,18 +942,23 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
 
         try:
             # Layer 1: Extract and parse JSON normally
-            json_str = self._extract_json_string(result)
-            parsed = json.loads(json_str)
+            extracted = self._extract_json_string(result)
+            if isinstance(extracted, dict):
+                parsed = extracted  # Already decoded during extraction
+            else:
+                json_str = extracted
+                parsed = orjson.loads(json_str)
             self.logger.debug(f"{self.agent_name} JSON parsed successfully on first attempt")
 
-        except (json.JSONDecodeError, ValueError) as e:
+        except (orjson.JSONDecodeError, json.JSONDecodeError, ValueError) as e:
             parse_error = str(e)
             self.logger.warning(f"{self.agent_name} initial JSON parsing failed: {parse_error}")
 
             # Layer 2: Try JSON repair
             if json_str:
                 try:
-                    repaired_json = repair_json(json_str)
+                    # repair_json is pure-Python CPU work; keep it off the event loop
+                    repaired_json = await asyncio.to_thread(repair_json, json_str)
                     parsed = json.loads(repaired_json)
                     self.logger.info(f"{self.agent_name} JSON repaired successfully")
                 except Exception as repair_error:
@@ -547,9 +968,9 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
             if parsed is None:
                 try:
                     self.logger.info(f"{self.agent_name} attempting LLM retry for JSON correction")
-                    retry_result = self._retry_json_with_llm(result, parse_error)
-                    retry_json_str = self._extract_json_string(retry_result)
-                    parsed = json.loads(retry_json_str)
+                    retry_result = await self._retry_json_with_llm(result, parse_error)
+                    retry_extracted = self._extract_json_string(retry_result)
+                    parsed = retry_extracted if isinstance(retry_extracted, dict) else orjson.loads(retry_extracted)
                     self.logger.info(f"{self.agent_name} LLM retry successful")
                 except Exception as retry_error:
                     self.logger.warning(f"{self.agent_name} LLM retry failed: {str(retry_error)}")
@@ -577,6 +998,12 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
                         raise ValueError("Missing 'action' field for action type")
 
                     action_data = parsed["action"]
+                    if isinstance(action_data, list):
+                        if len(action_data) > 1:
+                            return await self._execute_action_batch(action_data)
+                        if not action_data:
+                            raise ValueError("Empty action list")
+                        action_data = action_data[0]
                     if "name" not in action_data:
                         raise ValueError("Missing action name")
 
@@ -584,18 +1011,10 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
                     action_params = action_data.get("parameters", {})
 
                     # Validate action exists
-                    if action_name not in self.actions:
-                        # Try case-insensitive match
-                        action_name_lower = action_name.lower()
-                        matched_action = None
-                        for name in self.actions.keys():
-                            if name.lower() == action_name_lower:
-                                matched_action = name
-                                break
-
-                        if not matched_action:
-                            return f"Unknown action: {action_name}. Available: {', '.join(self.actions.keys())}", None
-                        action_name = matched_action
+                    resolved = self._resolve_action(action_name)
+                    if resolved is None:
+                        return f"Unknown action: {action_name}. Available: {', '.join(self.actions.keys())}", None
+                    action_name, action = resolved
 
                     self.logger.info(f"{self.agent_name} processing action: {action_name}")
 
@@ -608,7 +1027,7 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
                     try:
                         # Convert parameters to JSON string for handler
                         action_input = json.dumps(action_params) if action_params else "{}"
-                        observation = await self._execute_action_handler(self.actions[action_name], action_input)
+                        observation = await self._execute_action_handler(action, action_input)
                         return None, f"Observation: {observation}"
                     except Exception as e:
                         return f"Error executing {action_name}: {str(e)}", None
@@ -626,13 +1045,15 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
                 self.logger.warning(f"{self.agent_name} JSON validation failed: {str(validation_error)}, falling back to legacy parsing")
 
         # Layer 4: Fall back to legacy regex parsing
-        thought_match = re.search(r'^(?:\d*\.?\s*)?(?:thought|thinking):\s*(.*?)(?=^(?:\d*\.?\s*)?(?:action|response):|\Z)', result, re.MULTILINE | re.IGNORECASE | re.DOTALL)
-        action_match = re.search(r'^(?:\d*\.?\s*)?action:\s*(\w+):\s*(.*?)(?=^(?:\d*\.?\s*)?(?:observation|response|thought):|\Z)', result, re.MULTILINE | re.IGNORECASE | re.DOTALL)
-        response_match = re.search(r'^(?:\d*\.?\s*)?response:\s*(.*?)(?=^(?:\d*\.?\s*)?(?:thought|action):|\Z)', result, re.MULTILINE | re.IGNORECASE | re.DOTALL)
+        # Only reached when no JSON parsed or it failed validation; every valid JSON branch returns above
+        thought_match = _THOUGHT_RE.search(result)
+        action_match = _ACTION_RE.search(result)
+        response_match = _RESPONSE_RE.search(result)
 
-        self.logger.info(f"{self.agent_name} legacy thought match: {thought_match.group(1)[:100] if thought_match else None}")
-        self.logger.info(f"{self.agent_name} legacy action match: {action_match.group(1) + ': ' + action_match.group(2)[:50] if action_match else None}")
-        self.logger.info(f"{self.agent_name} legacy response match: {response_match.group(1)[:100] if response_match else None}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"{self.agent_name} legacy thought match: {thought_match.group(1)[:100] if thought_match else None}")
+            self.logger.debug(f"{self.agent_name} legacy action match: {action_match.group(1) + ': ' + action_match.group(2)[:50] if action_match else None}")
+            self.logger.debug(f"{self.agent_name} legacy response match: {response_match.group(1)[:100] if response_match else None}")
 
         # Store thought from legacy parsing
         if thought_match:
@@ -644,18 +1065,10 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
             action_input = action_match.group(2).strip()
 
             # Validate action exists (prevents false positives)
-            if action_name not in self.actions:
-                # Try case-insensitive match
-                action_name_lower = action_name.lower()
-                matched_action = None
-                for name in self.actions.keys():
-                    if name.lower() == action_name_lower:
-                        matched_action = name
-                        break
-
-                if not matched_action:
-                    return f"Unknown action: {action_name}. Available: {', '.join(self.actions.keys())}", None
-                action_name = matched_action
+            resolved = self._resolve_action(action_name)
+            if resolved is None:
+                return f"Unknown action: {action_name}. Available: {', '.join(self.actions.keys())}", None
+            action_name, action = resolved
 
             self.logger.info(f"{self.agent_name} processing legacy action: {action_name}")
 
@@ -666,7 +1079,7 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
             }
 
             try:
-                observation = await self._execute_action_handler(self.actions[action_name], action_input)
+                observation = await self._execute_action_handler(action, action_input)
                 return None, f"Observation: {observation}"
             except Exception as e:
                 return f"Error executing {action_name}: {str(e)}", None
@@ -677,7 +1090,7 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
             return response_match.group(1).strip(), None
 
         # Final fallback: treat as direct response only if no action-like patterns
-        if not re.search(r'\b(?:' + '|'.join(self.actions.keys()) + r')\b', result, re.IGNORECASE):
+        if not self._mentions_action(result):
             self.logger.info(f"{self.agent_name} treating as direct response (no action patterns found)")
             return result.strip(), None
 
@@ -698,120 +1111,110 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
         Returns:
             The final response string to send to the client
         """
+        cancellation_task = None
+        user_id_str = str(user_id)
         try:
+            self._semantic_cache_namespace = user_id_str
+
             # Log query start with structured context
             log_agent_event(
                 self.logger,
                 f"Starting query processing for user {user_id}",
                 agent_name=self.agent_name,
-                user_id=str(user_id),
+                user_id=user_id_str,
                 request_id=request_id,
                 action="query_start",
                 message_count=len(messages) if isinstance(messages, list) else 1
             )
 
+            # MAS logging needs both a database connection and a request to attach rows to
+            should_log_mas = bool(supabase and request_id)
+
             # Extract and log the user's request
-            user_request_content = ""
-            if isinstance(messages, list):
-                # Find the last user message in the list
-                for msg in reversed(messages):
-                    if isinstance(msg, Message) and msg.role == "user":
-                        user_request_content = msg.content
-                        break
-                    elif isinstance(msg, dict) and msg.get('role') == 'user':
-                        user_request_content = msg.get('content', '')
-                        break
-            elif isinstance(messages, Message) and messages.role == "user":
-                user_request_content = messages.content
-            elif isinstance(messages, dict) and messages.get('role') == 'user':
-                user_request_content = messages.get('content', '')
+            user_request_content = _last_user_content(messages) if should_log_mas else None
 
             # Log the user request if we found one
-            if user_request_content and supabase:
-                self._log_mas_step('user_request', user_request_content, user_id, request_id, 0, supabase)
+            if user_request_content:
+                self._log_mas_step('user_request', user_request_content, user_id_str, request_id, 0, supabase)
 
             self.add_message(messages)
             
-            # Define cancellation check function
+            # Poll for cancellation in the background so the loop only reads a flag
+            self._cancelled = False
+            check_cancellation_request = _resolve_cancellation_check()
+            if request_id and supabase and check_cancellation_request:
+                cancellation_task = asyncio.create_task(
+                    self._poll_cancellation(check_cancellation_request, request_id, user_id, supabase)
+                )
+
             def check_cancellation():
-                if request_id and supabase:
-                    try:
-                        from app.agents.primary_agent.primary_agent import check_cancellation_request
-                        from fastapi import HTTPException
-                        if check_cancellation_request(request_id, user_id, supabase):
-                            raise HTTPException(status_code=499, detail="Request was cancelled during agent processing")
-                    except ImportError:
-                        # check_cancellation_request not available, skip cancellation checking
-                        pass
+                if self._cancelled:
+                    raise HTTPException(status_code=499, detail="Request was cancelled during agent processing")
             
             action_count = 0
             
             while True:
                 # Check for cancellation before each iteration
                 check_cancellation()
+                self._trim_history()
                 
-                result = self.execute()
-                self.messages.append({
-                    "role": "assistant",
-                    "content": result,
-                    "type": "text"
-                })
+                result = await self.execute()
+                self.messages.append(_text_message(_ROLE_ASSISTANT, result))
+                self._note_settings_marker(result)
                 
                 response, observation = await self.process_actions(result)
-                self.logger.info(f"Response: {response}")
-                self.logger.info(f"Observation: {observation}")
+                self.logger.info("Response: %s", response)
+                self.logger.info("Observation: %s", observation)
 
                 # Log MAS steps if we have the stored data
-                if hasattr(self, '_current_thought') and self._current_thought:
-                    self._log_mas_step('thought', self._current_thought, user_id, request_id,
-                                     action_count, supabase)
+                if self._current_thought:
+                    if should_log_mas:
+                        self._log_mas_step('thought', self._current_thought, user_id_str, request_id,
+                                         action_count, supabase)
                     self._current_thought = None  # Clear after logging
 
-                if hasattr(self, '_current_action') and self._current_action:
-                    self._log_mas_step('action',
-                                     f"Action: {self._current_action['name']}",
-                                     user_id, request_id, action_count, supabase,
-                                     action_name=self._current_action['name'],
-                                     action_params=self._current_action['params'])
+                if self._current_action:
+                    if should_log_mas:
+                        self._log_mas_step('action',
+                                         f"Action: {self._current_action['name']}",
+                                         user_id_str, request_id, action_count, supabase,
+                                         action_name=self._current_action['name'],
+                                         action_params=self._current_action['params'])
                     self._current_action = None  # Clear after logging
                 
                 # If we got a response, return it
                 if response is not None:
                     # Log the final response
-                    self._log_mas_step('response', response, user_id, request_id,
-                                     action_count, supabase)
+                    if should_log_mas:
+                        self._log_mas_step('response', response, user_id_str, request_id,
+                                         action_count, supabase)
 
                     # Process observation embedding if the response contains the marker
-                    if self._last_observation and "$$$observation$$$" in response:
+                    if self._last_observation:
                         response = self._process_observation_embedding(response, self._last_observation)
 
                     # Check if this is the Config Agent and if settings were successfully updated
                     if self.agent_name == "Config Agent":
-                        response_lower = response.lower()
-                        self.settings_updated = (
-                            "successfully" in response_lower
-                        )
+                        self.settings_updated = "successfully" in response.casefold()
                         if self.settings_updated:
                             self.logger.info(f"Config Agent detected successful settings update: {response}")
                     
                     # For Chat Agent, check if any message contains settings update marker and preserve it
-                    if self.agent_name == "Chat Agent":
-                        for message in self.messages:
-                            if isinstance(message, dict) and "[SETTINGS_UPDATED]" in message.get("content", ""):
-                                if "[SETTINGS_UPDATED]" not in response:
-                                    response += " [SETTINGS_UPDATED]"
-                                    self.logger.info("Chat Agent preserving settings update marker in final response")
-                                break
+                    if self.agent_name == "Chat Agent" and self._has_settings_marker:
+                        if _SETTINGS_MARKER not in response:
+                            response += f" {_SETTINGS_MARKER}"
+                            self.logger.info("Chat Agent preserving settings update marker in final response")
                     
-                    # Log agent final response
+                    # Log agent final response; previews are only sliced when INFO is emitted
+                    info_enabled = self.logger.isEnabledFor(logging.INFO)
                     log_agent_event(
                         self.logger,
                         "Agent produced final response",
                         agent_name=self.agent_name,
-                        user_id=str(user_id),
+                        user_id=user_id_str,
                         request_id=request_id,
                         action="final_response",
-                        response_preview=response[:200] if response else None,
+                        response_preview=response[:200] if response and info_enabled else None,
                         response_length=len(response) if response else 0
                     )
                     
@@ -820,7 +1223,7 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
                         self.logger,
                         f"Query completed successfully for user {user_id}",
                         agent_name=self.agent_name,
-                        user_id=str(user_id),
+                        user_id=user_id_str,
                         request_id=request_id,
                         action="query_complete",
                         actions_executed=action_count,
@@ -833,37 +1236,36 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
                 if observation is not None:
                     action_count += 1
                     
-                    # Increment turn count for each action execution
+                    # Increment turn count for each action execution; applied in batches
                     if request_id and supabase:
-                        try:
-                            turn_result = supabase.rpc('increment_request_turns', {'request_id_param': request_id}).execute()
-                            if turn_result.data and turn_result.data != -1:
-                                self.logger.info(f"Agent {self.agent_name} action {action_count} incremented turn count to {turn_result.data} for request {request_id}")
-                            else:
-                                self.logger.error(f"Failed to increment turn count for request {request_id} in agent {self.agent_name} action {action_count}")
-                        except Exception as turn_error:
-                            self.logger.error(f"Error incrementing turn count in agent {self.agent_name} action {action_count}: {str(turn_error)}")
+                        self._pending_turn_increments += 1
+                        if self._pending_turn_increments >= _TURN_INCREMENT_FLUSH_INTERVAL:
+                            self._flush_turn_increments(request_id, supabase)
                     
                     # Log the observation
                     log_agent_event(
                         self.logger,
                         "Agent produced observation",
                         agent_name=self.agent_name,
-                        user_id=str(user_id),
+                        user_id=user_id_str,
                         request_id=request_id,
                         action="observation",
-                        observation=observation[:500] if observation else None,
+                        observation=observation[:500] if observation and self.logger.isEnabledFor(logging.INFO) else None,
                         action_count=action_count,
                         max_turns=self.max_turns
                     )
 
                     # Log observation in MAS logs
-                    self._log_mas_step('observation', observation, user_id, request_id,
-                                     action_count, supabase)
+                    if should_log_mas:
+                        self._log_mas_step('observation', observation, user_id_str, request_id,
+                                         action_count, supabase)
 
                     # Store the observation for potential embedding in the final response
                     self._last_observation = observation
 
+                    # Turn boundary: write this turn's MAS logs in one round-trip
+                    self._flush_mas_logs(supabase)
+
                     self.logger.info(f"Action {action_count}/{self.max_turns} executed")
 
                     # Check for cancellation after action execution
@@ -871,9 +1273,9 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
 
                     if action_count >= self.max_turns:
                         self.logger.warning("Max actions reached without final response")
-                        return self._handle_max_turns_reached()
+                        return await self._handle_max_turns_reached()
 
-                    self.logger.info(f"Adding observation to messages: {observation}")
+                    self.logger.info("Adding observation to messages: %s", observation)
                     self.add_message(observation)
                 else:
                     self.logger.info("No observation to process, ending query")
@@ -885,4 +1287,9 @@ Do not include any explanation - just the corrected JSON wrapped in ```json``` c
         except Exception as e:
             error_msg = f"Error in agent loop: {str(e)}"
             self.logger.error(error_msg)
-            return error_msg 
\ No newline at end of file
+            return error_msg
+        finally:
+            if cancellation_task:
+                cancellation_task.cancel()
+            self._flush_turn_increments(request_id, supabase)
+            self._flush_mas_logs(supabase)
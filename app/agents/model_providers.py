@@ -1,34 +1,166 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
-import requests
+from typing import List, Dict, Any, Optional, Callable, Tuple, Union
+from openai import AsyncOpenAI, DEFAULT_TIMEOUT as OPENAI_DEFAULT_TIMEOUT
+import httpx
+import asyncio
 import json
 import google.generativeai as genai
 import os
-import time
+import re
 import random
 import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+import orjson
 from dotenv import load_dotenv
 from app.utils.logging.component_loggers import get_agent_logger
+from app.utils.circuit_breaker import CircuitBreaker
+from app.config import USE_ONE_HOUR_CACHE, PROVIDER_MAX_CONCURRENCY, MIN_CACHEABLE_TOKENS, MIN_CACHEABLE_TOKENS_HAIKU
 
 load_dotenv(override=True)
 
+logger = get_agent_logger('ModelProviders', __name__)
+
+# Shared async HTTP client for all provider calls; pooled keep-alive connections avoid a
+# TCP/TLS handshake per request and let the event loop fan out concurrent LLM calls
+_HTTPX_CLIENT = httpx.AsyncClient(
+    http2=True,
+    timeout=httpx.Timeout(60.0),
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+)
+
+# Separate pool for fetching vision inputs from arbitrary image hosts, so slow image downloads
+# never hold connections the provider APIs need
+_IMAGE_HTTP_CLIENT = httpx.AsyncClient(
+    timeout=httpx.Timeout(30.0),
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+)
+
+
+async def close_http_clients() -> None:
+    """Close the shared provider HTTP clients (call on application shutdown)."""
+    await _HTTPX_CLIENT.aclose()
+    await _IMAGE_HTTP_CLIENT.aclose()
+
+
+# Backoff stops doubling after this many attempts
+_MAX_BACKOFF_EXPONENT = 5
+
+# OS-entropy RNG for retry jitter so forked workers never share a random stream
+_JITTER_RANDOM = random.SystemRandom()
+
 class RetryConfig:
     """Configuration for retry logic"""
-    def __init__(self, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 60.0, enable_fallback: bool = True):
+    __slots__ = ('max_retries', 'base_delay', 'max_delay', 'enable_fallback', 'jitter')
+
+    # Defaults keep a failing call's worst-case backoff short (full jitter averages half the cap),
+    # so fallback providers get their turn quickly instead of waiting out long sleeps
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 15.0, enable_fallback: bool = True,
+                 jitter: str = "full"):
         self.max_retries = max_retries
         self.base_delay = base_delay
         self.max_delay = max_delay
         self.enable_fallback = enable_fallback
+        self.jitter = jitter  # "full": uniform(0, cap); "equal": cap/2 + uniform(0, cap/2)
+
+# Deterministic-call response cache: completions for (near-)zero temperature requests are
+# reused for identical provider/model/messages within the TTL
+_RESPONSE_CACHE_MAX_TEMPERATURE = 0.05
+_RESPONSE_CACHE_MAX_ENTRIES = 10_000
+_RESPONSE_CACHE_TTL_SECONDS = 3600
+_RESPONSE_CACHE: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, completion)
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+def _response_cache_key(provider: "ModelProvider", messages: List[Dict[str, Any]], temperature: float) -> str:
+    """Hash provider, model, rounded temperature and messages into a cache key"""
+    return hashlib.sha256(orjson.dumps(
+        [provider.PROVIDER_NAME, provider.model, round(temperature, 3), messages],
+        option=orjson.OPT_SORT_KEYS,
+        default=str
+    )).hexdigest()
+
+def cache_deterministic_response(func):
+    """Decorator serving repeated low-temperature generate_response calls from an in-process LRU+TTL cache"""
+    async def wrapper(self, messages: List[Dict[str, Any]], temperature: float) -> str:
+        if temperature > _RESPONSE_CACHE_MAX_TEMPERATURE or (messages and messages[-1].get("no_cache")):
+            return await func(self, messages, temperature)
+
+        key = _response_cache_key(self, messages, temperature)
+        now = time.monotonic()
+        with _RESPONSE_CACHE_LOCK:
+            entry = _RESPONSE_CACHE.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    _RESPONSE_CACHE.move_to_end(key)
+                    self.logger.info(f"Serving cached response for {self.PROVIDER_NAME} (model: {self.model}, cached=True)")
+                    return entry[1]
+                del _RESPONSE_CACHE[key]
+
+        completion = await func(self, messages, temperature)
+        if completion:
+            with _RESPONSE_CACHE_LOCK:
+                _RESPONSE_CACHE[key] = (now + _RESPONSE_CACHE_TTL_SECONDS, completion)
+                _RESPONSE_CACHE.move_to_end(key)
+                while len(_RESPONSE_CACHE) > _RESPONSE_CACHE_MAX_ENTRIES:
+                    _RESPONSE_CACHE.popitem(last=False)
+        return completion
+    return wrapper
+
+# Per-provider semaphores capping in-flight requests (created on first use, inside the event loop)
+# plus counts of calls holding a slot and calls waiting for one
+_PROVIDER_SEMAPHORES: Dict[str, asyncio.Semaphore] = {}
+_PROVIDER_IN_FLIGHT: Dict[str, int] = {provider_name: 0 for provider_name in PROVIDER_MAX_CONCURRENCY}
+_PROVIDER_QUEUE_DEPTH: Dict[str, int] = {provider_name: 0 for provider_name in PROVIDER_MAX_CONCURRENCY}
+
+async def _call_with_concurrency_limit(provider_name: Optional[str], func, *args, **kwargs):
+    """Await func while holding one of the provider's concurrency slots"""
+    limit = PROVIDER_MAX_CONCURRENCY.get(provider_name)
+    if limit is None:
+        return await func(*args, **kwargs)
+
+    semaphore = _PROVIDER_SEMAPHORES.get(provider_name)
+    if semaphore is None:
+        semaphore = _PROVIDER_SEMAPHORES[provider_name] = asyncio.Semaphore(limit)
+
+    _PROVIDER_QUEUE_DEPTH[provider_name] += 1
+    try:
+        await semaphore.acquire()
+    finally:
+        _PROVIDER_QUEUE_DEPTH[provider_name] -= 1
+    _PROVIDER_IN_FLIGHT[provider_name] += 1
+    try:
+        return await func(*args, **kwargs)
+    finally:
+        _PROVIDER_IN_FLIGHT[provider_name] -= 1
+        semaphore.release()
+
+def get_provider_concurrency_status() -> Dict[str, Any]:
+    """Get the concurrency limit, in-flight requests and queue depth of every provider"""
+    return {
+        provider_name: {
+            "max_concurrency": limit,
+            "in_flight": _PROVIDER_IN_FLIGHT[provider_name],
+            "queue_depth": _PROVIDER_QUEUE_DEPTH[provider_name]
+        }
+        for provider_name, limit in PROVIDER_MAX_CONCURRENCY.items()
+    }
 
 def exponential_backoff_retry(func):
-    """Decorator to add exponential backoff retry logic to model provider methods"""
-    def wrapper(self, *args, **kwargs):
+    """Decorator to add exponential backoff retry logic to async model provider methods"""
+    async def wrapper(self, *args, **kwargs):
         retry_config = getattr(self, 'retry_config', RetryConfig())
+        breaker = _PROVIDER_BREAKERS.get(self.PROVIDER_NAME)
         
         for attempt in range(retry_config.max_retries + 1):
             try:
-                return func(self, *args, **kwargs)
+                # The breaker check runs before queueing, so calls to an open provider fail fast
+                if breaker is not None:
+                    return await breaker.call_async(_call_with_concurrency_limit, self.PROVIDER_NAME, func, self, *args, **kwargs)
+                return await _call_with_concurrency_limit(self.PROVIDER_NAME, func, self, *args, **kwargs)
             except Exception as e:
                 # Don't retry on the last attempt
                 if attempt == retry_config.max_retries:
@@ -39,22 +171,38 @@ def exponential_backoff_retry(func):
                     raise e
                 
                 # Calculate delay with exponential backoff and jitter
-                delay = min(
-                    retry_config.base_delay * (2 ** attempt),
+                cap = min(
+                    retry_config.base_delay * (1 << min(attempt, _MAX_BACKOFF_EXPONENT)),
                     retry_config.max_delay
                 )
-                # Add jitter to prevent thundering herd
-                delay += random.uniform(0, delay * 0.1)
+                # Randomize across the whole window so concurrent retries don't re-synchronize
+                if retry_config.jitter == "equal":
+                    delay = cap / 2 + _JITTER_RANDOM.uniform(0, cap / 2)
+                else:
+                    delay = _JITTER_RANDOM.uniform(0, cap)
                 
-                print(f"Attempt {attempt + 1} failed with {type(e).__name__}: {str(e)}")
-                print(f"Retrying in {delay:.2f} seconds...")
-                time.sleep(delay)
+                logger.info(
+                    f"Attempt {attempt + 1} failed with {type(e).__name__}: {str(e)}; retrying in {delay:.2f} seconds",
+                    extra={"attempt": attempt + 1, "delay": delay, "provider": self.PROVIDER_NAME}
+                )
+                await asyncio.sleep(delay)
         
         return None  # Should never reach here
     return wrapper
 
+# Error message fragments that indicate a transient failure worth retrying
+_RETRYABLE_RE = re.compile(
+    r'timeout|connection|server error|internal error|service unavailable|bad gateway|'
+    r'gateway timeout|rate limit|too many requests',
+    re.IGNORECASE
+)
+
 def _is_retryable_error(error: Exception) -> bool:
     """Determine if an error is retryable"""
+    # Provider wrappers re-raise HTTP failures as RuntimeError; classify the original error
+    if isinstance(error, RuntimeError) and isinstance(error.__cause__, httpx.HTTPError):
+        return _is_retryable_error(error.__cause__)
+
     # OpenAI specific errors
     if hasattr(error, 'status_code'):
         status_code = error.status_code
@@ -65,61 +213,76 @@ def _is_retryable_error(error: Exception) -> bool:
         if 400 <= status_code < 500:
             return False
     
-    # Requests specific errors
-    if isinstance(error, requests.exceptions.RequestException):
-        if isinstance(error, requests.exceptions.HTTPError):
-            if hasattr(error, 'response') and error.response is not None:
-                status_code = error.response.status_code
-                # Retry on server errors and rate limits
-                if status_code >= 500 or status_code == 429:
-                    return True
-                # Don't retry on client errors
-                if 400 <= status_code < 500:
-                    return False
-        # Retry on timeout, connection errors, etc.
-        if isinstance(error, (requests.exceptions.Timeout, 
-                            requests.exceptions.ConnectionError,
-                            requests.exceptions.ChunkedEncodingError)):
-            return True
-    
-    # Check error message for common retryable patterns
-    error_str = str(error).lower()
-    retryable_patterns = [
-        'timeout', 'connection', 'server error', 'internal error',
-        'service unavailable', 'bad gateway', 'gateway timeout',
-        'rate limit', 'too many requests'
-    ]
-    
-    for pattern in retryable_patterns:
-        if pattern in error_str:
+    # httpx specific errors
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        # Retry on server errors and rate limits
+        if status_code >= 500 or status_code == 429:
             return True
+        # Don't retry on client errors
+        if 400 <= status_code < 500:
+            return False
+    # Retry on timeout, connection errors, etc.
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError)):
+        return True
     
-    # Default to not retryable for unknown errors
-    return False
+    # Check error message for common retryable patterns; unknown errors are not retryable
+    return _RETRYABLE_RE.search(str(error)) is not None
 
 def get_fallback_providers():
     """Get the ordered list of fallback providers"""
     return ['anthropic', 'google', 'openai', 'xai']
 
+# Per-provider circuit breakers: a provider that keeps failing with retryable (server-side)
+# errors is skipped until its recovery timeout passes instead of burning the full retry budget
+_PROVIDER_BREAKERS = {
+    provider_name: CircuitBreaker(
+        failure_threshold=5,
+        recovery_timeout=30,
+        name=f"provider_{provider_name}",
+        is_failure=_is_retryable_error
+    )
+    for provider_name in get_fallback_providers()
+}
+
+def is_provider_circuit_open(provider_name: str) -> bool:
+    """Check if a provider's circuit breaker is currently rejecting calls"""
+    breaker = _PROVIDER_BREAKERS.get(provider_name)
+    return breaker is not None and breaker.is_open
+
+def get_provider_breaker_status() -> Dict[str, Any]:
+    """Get state and statistics of every provider circuit breaker"""
+    return {provider_name: breaker.get_status() for provider_name, breaker in _PROVIDER_BREAKERS.items()}
+
+# Environment variable holding each provider's API key
+PROVIDER_KEYS = {
+    'openai': 'OPENAI_API_KEY',
+    'anthropic': 'ANTHROPIC_API_KEY',
+    'xai': 'XAI_API_KEY',
+    'google': 'GEMINI_API_KEY'
+}
+
+# API keys read once at import; call refresh_api_keys() after changing the environment
+_API_KEYS: Dict[str, Optional[str]] = {}
+
+def refresh_api_keys() -> None:
+    """Re-read provider API keys from the environment"""
+    _API_KEYS.clear()
+    _API_KEYS.update((provider_name, os.getenv(env_var)) for provider_name, env_var in PROVIDER_KEYS.items())
+
+refresh_api_keys()
+
 def is_provider_available(provider_name: str) -> bool:
     """Check if a provider has the required API key configured"""
-    provider_keys = {
-        'openai': 'OPENAI_API_KEY',
-        'anthropic': 'ANTHROPIC_API_KEY', 
-        'xai': 'XAI_API_KEY',
-        'google': 'GEMINI_API_KEY'
-    }
-    
-    if provider_name not in provider_keys:
-        return False
-        
-    api_key = os.getenv(provider_keys[provider_name])
+    api_key = _API_KEYS.get(provider_name)
     return api_key is not None and api_key.strip() != ''
 
 def create_fallback_provider(provider_name: str, retry_config: Optional[RetryConfig] = None):
     """Create a provider instance for fallback use"""
     if not is_provider_available(provider_name):
         return None
+    if is_provider_circuit_open(provider_name):
+        return None
         
     if retry_config is None:
         retry_config = RetryConfig()
@@ -136,18 +299,78 @@ def create_fallback_provider(provider_name: str, retry_config: Optional[RetryCon
         else:
             return None
     except Exception as e:
-        print(f"Failed to create {provider_name} provider: {str(e)}")
+        logger.error(f"Failed to create {provider_name} provider: {str(e)}")
         return None
 
+async def generate_response_hedged(
+    primary: "ModelProvider",
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    backup_factory: Callable[[], Optional["ModelProvider"]],
+    backup_messages: Optional[List[Dict[str, Any]]] = None,
+    hedge_delay: float = 2.0
+) -> str:
+    """
+    Race the primary provider against a backup started after hedge_delay seconds.
+
+    Args:
+        primary: Provider tried first
+        messages: Messages sent to the primary provider
+        temperature: Sampling temperature for both providers
+        backup_factory: Returns the backup provider, or None if no backup is available
+        backup_messages: Messages sent to the backup (defaults to messages)
+        hedge_delay: Seconds to wait on the primary before starting the backup
+
+    Returns:
+        The first successful response
+
+    Raises:
+        The primary provider's error if neither provider succeeds
+    """
+    primary_task = asyncio.create_task(primary.generate_response(messages, temperature))
+    tasks = [primary_task]
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=hedge_delay)
+        if done:
+            return primary_task.result()
+
+        backup = backup_factory()
+        if backup is None:
+            return await primary_task
+
+        backup_task = asyncio.create_task(
+            backup.generate_response(backup_messages if backup_messages is not None else messages, temperature)
+        )
+        tasks.append(backup_task)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        # Both providers failed; surface the primary's error
+        return primary_task.result()
+    finally:
+        # Cancel whatever is still running (also when the caller itself is cancelled) and
+        # retrieve the error of any finished loser so it is never reported as unretrieved
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
 class ModelProvider(ABC):
     """Abstract base class for different LLM providers"""
     
+    __slots__ = ()
+    PROVIDER_NAME: Optional[str] = None  # Key into the per-provider circuit breakers
+    
     @abstractmethod
-    def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
+    async def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
         """Generate a response from the model given a list of messages"""
         pass
     
-    def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
+    async def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
         """Generate a response from a vision-capable model given text and image
         
         Args:
@@ -160,29 +383,65 @@ class ModelProvider(ABC):
         """
         raise NotImplementedError("Vision response not implemented for this provider")
 
+    async def generate_vision_response_batch(
+        self,
+        items: List[Tuple[str, str]],
+        temperature: float = 0.1,
+        max_concurrency: int = 8
+    ) -> List[Union[str, BaseException]]:
+        """Run generate_vision_response for many (text_prompt, image_url) pairs concurrently
+        
+        Args:
+            items: (text_prompt, image_url) pairs
+            temperature: Sampling temperature for every response
+            max_concurrency: Maximum number of vision calls in flight at once
+            
+        Returns:
+            One entry per item, in order: the response, or the exception that call raised
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_one(text_prompt: str, image_url: str) -> str:
+            async with semaphore:
+                return await self.generate_vision_response(text_prompt, image_url, temperature)
+
+        return await asyncio.gather(
+            *(run_one(text_prompt, image_url) for text_prompt, image_url in items),
+            return_exceptions=True
+        )
+
 class OpenAIProvider(ModelProvider):
     """OpenAI model provider implementation"""
     
+    __slots__ = ('logger', 'client', 'model', 'retry_config')
+    PROVIDER_NAME = "openai"
     DEFAULT_MODEL = "o3-mini-2025-01-31"
+    VISION_MODEL = "gpt-4o"  # Used for vision tasks regardless of the chat model
     
     def __init__(self, model: Optional[str] = None, retry_config: Optional[RetryConfig] = None):
         self.logger = get_agent_logger('OpenAIProvider', __name__)
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        # The SDK would otherwise inherit the shared client's 60s timeout; keep its own default
+        self.client = AsyncOpenAI(
+            api_key=_API_KEYS['openai'],
+            http_client=_HTTPX_CLIENT,
+            timeout=OPENAI_DEFAULT_TIMEOUT
+        )
         self.model = model if model is not None else self.DEFAULT_MODEL
         self.retry_config = retry_config if retry_config is not None else RetryConfig()
         self.logger.info(f"Initialized OpenAIProvider with model: {self.model}")
     
+    @cache_deterministic_response
     @exponential_backoff_retry
-    def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
+    async def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
         # Some OpenAI models (like o3) do not support the temperature parameter
         # We'll omit it if the model name starts with 'o3-'
         if self.model.startswith("o3-"):
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages
             )
         else:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=temperature
@@ -192,7 +451,7 @@ class OpenAIProvider(ModelProvider):
         return completion
     
     @exponential_backoff_retry
-    def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
+    async def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
         """Generate response using GPT-4o vision capabilities"""
         messages = [
             {
@@ -212,28 +471,105 @@ class OpenAIProvider(ModelProvider):
             }
         ]
         
-        # Use GPT-4o for vision tasks
-        vision_model = "gpt-4o"
-        response = self.client.chat.completions.create(
-            model=vision_model,
+        response = await self.client.chat.completions.create(
+            model=self.VISION_MODEL,
             messages=messages,
             temperature=temperature,
             max_tokens=500
         )
         
         completion = response.choices[0].message.content
-        self.logger.info(f"Generated vision response from OpenAIProvider (model: {vision_model})")
+        self.logger.info(f"Generated vision response from OpenAIProvider (model: {self.VISION_MODEL})")
         return completion
 
+def _http_error_body(error: httpx.HTTPStatusError) -> Any:
+    """Decode an error response body once (JSON if possible, else text), caching it on the exception"""
+    error_body = getattr(error, 'err_body', None)
+    if error_body is None:
+        try:
+            error_body = orjson.loads(error.response.content)
+        except orjson.JSONDecodeError:
+            error_body = error.response.text
+        error.err_body = error_body
+    return error_body
+
+# Plain-string system prompts are split into a cached stable prefix and a dynamic suffix once
+# the prefix reaches the model's minimum cacheable length; the suffix starts at the first
+# section that varies per agent
+STABLE_PROMPT_SUFFIX = "=== General Instructions ==="
+
+
+def min_cacheable_tokens(model: Optional[str]) -> int:
+    """Smallest prompt prefix, in tokens, that Anthropic will cache for the given model."""
+    return MIN_CACHEABLE_TOKENS_HAIKU if model and "haiku" in model.lower() else MIN_CACHEABLE_TOKENS
+
+
+def _build_system_blocks(stable: str, dynamic: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Build Anthropic system blocks with the stable prefix marked for prompt caching"""
+    blocks = [{
+        "type": "text",
+        "text": stable,
+        "cache_control": {"type": "ephemeral", "ttl": "1h" if USE_ONE_HOUR_CACHE else "5m"}
+    }]
+    if dynamic:
+        blocks.append({"type": "text", "text": dynamic})
+    return blocks
+
+# Bytes of the image kept for magic-byte format detection
+_IMAGE_HEAD_BYTES = 12
+
+# Magic-byte prefixes of the image formats Claude vision accepts
+_IMAGE_MAGIC_TABLE = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+def _detect_image_type(head: bytes) -> Optional[str]:
+    """Detect an image's media type from its first bytes, or None if unrecognized"""
+    content_type = next((media_type for prefix, media_type in _IMAGE_MAGIC_TABLE if head.startswith(prefix)), None)
+    if content_type is None and head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        # WebP is a RIFF container: 'RIFF', 4-byte size, then 'WEBP'
+        content_type = 'image/webp'
+    return content_type
+
+async def _fetch_image_base64(image_url: str) -> Tuple[str, bytes, Optional[str]]:
+    """
+    Download an image and base64-encode it chunk by chunk, so the raw image is never held in full.
+
+    Returns:
+        Tuple of (base64 data, first bytes of the image, Content-Type header)
+    """
+    encoded = bytearray()
+    head = b""
+    pending = b""
+    async with _IMAGE_HTTP_CLIENT.stream("GET", image_url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(65536):
+            if len(head) < _IMAGE_HEAD_BYTES:
+                head = (head + chunk)[:_IMAGE_HEAD_BYTES]
+            data = pending + chunk
+            # Encode whole 3-byte groups only so the concatenated output has no inner padding
+            aligned = len(data) - len(data) % 3
+            encoded += base64.b64encode(data[:aligned])
+            pending = data[aligned:]
+        header_content_type = response.headers.get('content-type')
+    if pending:
+        encoded += base64.b64encode(pending)
+    return encoded.decode('ascii'), head, header_content_type
+
 class AnthropicProvider(ModelProvider):
     """Anthropic model provider implementation using custom HTTP requests"""
     
+    __slots__ = ('logger', 'api_key', 'model', 'retry_config', '_headers', '_min_cacheable_chars')
+    PROVIDER_NAME = "anthropic"
     DEFAULT_MODEL = "claude-sonnet-4-5-20250929"
     API_URL = "https://api.anthropic.com/v1/messages"
     
     def __init__(self, model: Optional[str] = None, retry_config: Optional[RetryConfig] = None):
         self.logger = get_agent_logger('AnthropicProvider', __name__)
-        self.api_key = os.getenv("ANTHROPIC_API_KEY")
+        self.api_key = _API_KEYS['anthropic']
         if not self.api_key:
             raise ValueError("ANTHROPIC_API_KEY environment variable is required")
         # Debug: Check if API key is properly formatted (should start with 'sk-ant-')
@@ -241,10 +577,19 @@ class AnthropicProvider(ModelProvider):
             raise ValueError("ANTHROPIC_API_KEY appears to be invalid - should start with 'sk-ant-'")
         self.model = model if model is not None else self.DEFAULT_MODEL
         self.retry_config = retry_config if retry_config is not None else RetryConfig()
+        # Request headers are identical for every call; pre-encoded so httpx sends them as-is
+        self._headers = [
+            (b"content-type", b"application/json"),
+            (b"x-api-key", self.api_key.encode()),
+            (b"anthropic-version", b"2023-06-01")
+        ]
+        # ~4 characters per token, the same estimate build_system_prompt uses
+        self._min_cacheable_chars = 4 * min_cacheable_tokens(self.model)
         self.logger.info(f"Initialized AnthropicProvider with model: {self.model}")
     
+    @cache_deterministic_response
     @exponential_backoff_retry
-    def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
+    async def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
         """Generate response using custom HTTP requests to Anthropic API"""
         
         # Extract and process system message with cache control support
@@ -285,33 +630,29 @@ class AnthropicProvider(ModelProvider):
                 # Already structured for cache control
                 payload["system"] = system_content
             elif isinstance(system_content, str):
-                # Plain text system prompt (backward compatibility)
-                payload["system"] = system_content
+                # Plain text system prompt: cache the stable prefix only if it is long enough to be cached
+                split_at = system_content.find(STABLE_PROMPT_SUFFIX)
+                if split_at >= self._min_cacheable_chars:
+                    payload["system"] = _build_system_blocks(system_content[:split_at], system_content[split_at:])
+                else:
+                    payload["system"] = system_content
             else:
                 # Handle dict format (single system block with cache control)
                 payload["system"] = [system_content]
         
-        # Prepare headers
-        headers = {
-            "Content-Type": "application/json",
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01"
-        }
-        
         try:
             # Make the HTTP request
-            response = requests.post(
+            response = await _HTTPX_CLIENT.post(
                 self.API_URL,
-                headers=headers,
-                json=payload,
-                timeout=60
+                headers=self._headers,
+                content=orjson.dumps(payload)
             )
             
             # Check if request was successful
             response.raise_for_status()
             
             # Parse the response
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
 
             # Extract the content from the response
             if "content" in response_data and len(response_data["content"]) > 0:
@@ -344,23 +685,19 @@ class AnthropicProvider(ModelProvider):
             else:
                 raise ValueError("Unexpected response format from Anthropic API")
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             # Log detailed error information for HTTP responses
             error_details = str(e)
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_body = e.response.json()
-                    self.logger.error(f"Anthropic API error details: {error_body}")
-                    error_details = f"{error_details} - Response: {error_body}"
-                except:
-                    self.logger.error(f"Anthropic API error response body: {e.response.text}")
-                    error_details = f"{error_details} - Response: {e.response.text}"
-            raise RuntimeError(f"Error making request to Anthropic API: {error_details}")
+            if isinstance(e, httpx.HTTPStatusError):
+                error_body = _http_error_body(e)
+                self.logger.error(f"Anthropic API error details: {error_body}")
+                error_details = f"{error_details} - Response: {error_body}"
+            raise RuntimeError(f"Error making request to Anthropic API: {error_details}") from e
         except (KeyError, IndexError, ValueError) as e:
             raise RuntimeError(f"Error parsing Anthropic API response: {str(e)}")
     
     @exponential_backoff_retry
-    def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
+    async def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
         """Generate response using Claude vision capabilities"""
 
         # Check if image_url is already a data URL
@@ -385,26 +722,14 @@ class AnthropicProvider(ModelProvider):
         else:
             # Claude doesn't support image URLs - need to fetch and convert to base64
             try:
-                # Fetch the image from URL
-                image_response = requests.get(image_url, timeout=30)
-                image_response.raise_for_status()
-
-                # Convert to base64
-                image_base64 = base64.b64encode(image_response.content).decode('utf-8')
+                # Fetch the image from URL, base64-encoding it as it streams in
+                image_base64, image_data, header_content_type = await _fetch_image_base64(image_url)
 
                 # Detect image format from image data (magic bytes)
-                image_data = image_response.content
-                if image_data.startswith(b'\x89PNG\r\n\x1a\n'):
-                    content_type = 'image/png'
-                elif image_data.startswith(b'\xff\xd8\xff'):
-                    content_type = 'image/jpeg'
-                elif image_data.startswith(b'GIF87a') or image_data.startswith(b'GIF89a'):
-                    content_type = 'image/gif'
-                elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:12]:
-                    content_type = 'image/webp'
-                else:
+                content_type = _detect_image_type(image_data)
+                if content_type is None:
                     # Fallback to HTTP header if we can't detect from magic bytes
-                    content_type = image_response.headers.get('content-type', 'image/jpeg')
+                    content_type = header_content_type or 'image/jpeg'
                     if 'image/' not in content_type:
                         content_type = 'image/jpeg'  # Final fallback
 
@@ -442,27 +767,19 @@ class AnthropicProvider(ModelProvider):
             "messages": anthropic_messages
         }
         
-        # Prepare headers
-        headers = {
-            "Content-Type": "application/json",
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01"
-        }
-        
         try:
             # Make the HTTP request
-            response = requests.post(
+            response = await _HTTPX_CLIENT.post(
                 self.API_URL,
-                headers=headers,
-                json=payload,
-                timeout=60
+                headers=self._headers,
+                content=orjson.dumps(payload)
             )
             
             # Check if request was successful
             response.raise_for_status()
             
             # Parse the response
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             
             # Extract the content from the response
             if "content" in response_data and len(response_data["content"]) > 0:
@@ -471,54 +788,55 @@ class AnthropicProvider(ModelProvider):
             else:
                 raise ValueError("Unexpected response format from Anthropic API")
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             # Log detailed error information for HTTP responses
             error_details = str(e)
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_body = e.response.json()
-                    self.logger.error(f"Anthropic Vision API error details: {error_body}")
-                    error_details = f"{error_details} - Response: {error_body}"
-                except:
-                    self.logger.error(f"Anthropic Vision API error response body: {e.response.text}")
-                    error_details = f"{error_details} - Response: {e.response.text}"
-            raise RuntimeError(f"Error making vision request to Anthropic API: {error_details}")
+            if isinstance(e, httpx.HTTPStatusError):
+                error_body = _http_error_body(e)
+                self.logger.error(f"Anthropic Vision API error details: {error_body}")
+                error_details = f"{error_details} - Response: {error_body}"
+            raise RuntimeError(f"Error making vision request to Anthropic API: {error_details}") from e
         except (KeyError, IndexError, ValueError) as e:
             raise RuntimeError(f"Error parsing Anthropic vision API response: {str(e)}")
 
+# Grok display names (lowercased) and API names -> API model name
+_GROK_API_MODELS = {
+    "grok 3": "grok-3",
+    "grok 3.5": "grok-3.5",
+    "grok-3": "grok-3",
+    "grok-3.5": "grok-3.5",
+}
+
 class GrokProvider(ModelProvider):
     """Grok (x.ai) model provider implementation"""
     
+    __slots__ = ('logger', 'client', 'model', '_api_model', 'retry_config')
+    PROVIDER_NAME = "xai"
     DEFAULT_MODEL = "grok-3"
+    VISION_MODEL = "grok-vision-beta"  # Used for vision tasks regardless of the chat model
     
     def __init__(self, model: Optional[str] = None, retry_config: Optional[RetryConfig] = None):
         self.logger = get_agent_logger('GrokProvider', __name__)
         # Grok uses OpenAI-compatible API with custom base URL
-        self.client = OpenAI(
-            api_key=os.getenv("XAI_API_KEY"),
-            base_url="https://api.x.ai/v1"
+        self.client = AsyncOpenAI(
+            api_key=_API_KEYS['xai'],
+            base_url="https://api.x.ai/v1",
+            http_client=_HTTPX_CLIENT,
+            timeout=OPENAI_DEFAULT_TIMEOUT
         )
         self.model = model if model is not None else self.DEFAULT_MODEL
+        # Convert display name to API model name
+        self._api_model = _GROK_API_MODELS.get(self.model.lower())
+        if self._api_model is None:
+            raise ValueError(f"Invalid model: {self.model}")
         self.retry_config = retry_config if retry_config is not None else RetryConfig()
         self.logger.info(f"Initialized GrokProvider with model: {self.model}")
     
+    @cache_deterministic_response
     @exponential_backoff_retry
-    def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
-        # Convert display name to API model name
-        model_lower = self.model.lower()
-        if model_lower == "grok 3":
-            api_model = "grok-3"
-        elif model_lower == "grok 3.5":
-            api_model = "grok-3.5"
-        elif self.model == "grok-3":  # Already in API format
-            api_model = "grok-3"
-        elif self.model == "grok-3.5":  # Already in API format
-            api_model = "grok-3.5"
-        else:
-            raise ValueError(f"Invalid model: {self.model}")
-        
-        response = self.client.chat.completions.create(
-            model=api_model,
+    async def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
+        response = await self.client.chat.completions.create(
+            model=self._api_model,
             messages=messages,
             temperature=temperature
         )
@@ -527,7 +845,7 @@ class GrokProvider(ModelProvider):
         return completion
     
     @exponential_backoff_retry
-    def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
+    async def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
         """Generate response using Grok vision capabilities"""
         messages = [
             {
@@ -548,62 +866,74 @@ class GrokProvider(ModelProvider):
             }
         ]
         
-        # Use grok-vision-beta for vision tasks
-        vision_model = "grok-vision-beta"
-        response = self.client.chat.completions.create(
-            model=vision_model,
+        response = await self.client.chat.completions.create(
+            model=self.VISION_MODEL,
             messages=messages,
             temperature=temperature,
             max_tokens=500
         )
         
         completion = response.choices[0].message.content
-        self.logger.info(f"Generated vision response from GrokProvider (model: {vision_model})")
+        self.logger.info(f"Generated vision response from GrokProvider (model: {self.VISION_MODEL})")
         return completion
 
 
+# GenerativeModel instances shared across GoogleProvider instances, keyed by (model, api_key)
+_GEMINI_MODELS: Dict[Tuple[str, str], genai.GenerativeModel] = {}
+
+@lru_cache(maxsize=32)
+def _gemini_generation_config(temperature: float) -> genai.GenerationConfig:
+    """Return a shared GenerationConfig per (rounded) temperature"""
+    return genai.GenerationConfig(temperature=temperature)
+
 class GoogleProvider(ModelProvider):
     """Google Gemini model provider implementation"""
 
+    __slots__ = ('logger', 'api_key', 'model', '_model_obj', 'retry_config')
+    PROVIDER_NAME = "google"
     DEFAULT_MODEL = "gemini-1.5-flash"
 
     def __init__(self, model: Optional[str] = None, retry_config: Optional[RetryConfig] = None):
         self.logger = get_agent_logger('GoogleProvider', __name__)
-        self.api_key = os.getenv("GEMINI_API_KEY")
+        self.api_key = _API_KEYS['google']
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         # Configure the API key
         genai.configure(api_key=self.api_key)
         self.model = model if model is not None else self.DEFAULT_MODEL
+        model_key = (self.model, self.api_key)
+        self._model_obj = _GEMINI_MODELS.get(model_key)
+        if self._model_obj is None:
+            self._model_obj = _GEMINI_MODELS[model_key] = genai.GenerativeModel(self.model)
         self.retry_config = retry_config if retry_config is not None else RetryConfig()
         self.logger.info(f"Initialized GoogleProvider with model: {self.model}")
 
+    @cache_deterministic_response
     @exponential_backoff_retry
-    def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
-        # Convert messages to Gemini format
-        system_prompt = next((msg["content"] for msg in messages if msg["role"] == "system"), None)
-
-        # Build the content for Gemini
-        contents = []
+    async def generate_response(self, messages: List[Dict[str, Any]], temperature: float) -> str:
+        # Convert messages to Gemini format in one pass; slot 0 is reserved for the first system prompt
+        parts = [None]
         for msg in messages:
-            if msg["role"] == "user":
-                contents.append(msg["content"])
-            elif msg["role"] == "assistant":
+            role = msg["role"]
+            if role == "user":
+                parts.append(msg["content"])
+            elif role == "assistant":
                 # For conversation history, we can add assistant messages as context
-                contents.append(f"Assistant: {msg['content']}")
+                parts.append(f"Assistant: {msg['content']}")
+            elif role == "system" and parts[0] is None:
+                parts[0] = msg["content"] or ""
 
         # Combine all content into a single prompt
-        if system_prompt:
-            full_content = f"System: {system_prompt}\n\n" + "\n\n".join(contents)
+        if parts[0]:
+            parts[0] = f"System: {parts[0]}"
+            full_content = "\n\n".join(parts)
         else:
-            full_content = "\n\n".join(contents)
+            full_content = "\n\n".join(parts[1:])
 
         try:
-            # Create a GenerativeModel instance
-            model = genai.GenerativeModel(self.model)
-            response = model.generate_content(
+            response = await self._model_obj.generate_content_async(
                 full_content,
-                generation_config=genai.GenerationConfig(temperature=temperature)
+                generation_config=_gemini_generation_config(round(temperature, 3))
             )
 
             if hasattr(response, 'text') and response.text:
@@ -616,7 +946,7 @@ class GoogleProvider(ModelProvider):
             raise RuntimeError(f"Error generating response from Gemini API: {str(e)}")
 
     @exponential_backoff_retry
-    def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
+    async def generate_vision_response(self, text_prompt: str, image_url: str, temperature: float = 0.1) -> str:
         """Generate response using Gemini vision capabilities"""
 
         # Combine text prompt and image URL for Gemini
@@ -624,11 +954,9 @@ class GoogleProvider(ModelProvider):
         full_content = f"{text_prompt}\n\nImage URL: {image_url}"
 
         try:
-            # Create a GenerativeModel instance
-            model = genai.GenerativeModel(self.model)
-            response = model.generate_content(
+            response = await self._model_obj.generate_content_async(
                 full_content,
-                generation_config=genai.GenerationConfig(temperature=temperature)
+                generation_config=_gemini_generation_config(round(temperature, 3))
             )
 
             if hasattr(response, 'text') and response.text:
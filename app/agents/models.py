@@ -1,5 +1,5 @@
 from typing import Dict, Any, List, Callable, Optional, Literal
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 
 class Message(BaseModel):
@@ -18,5 +18,16 @@ class Action(BaseModel):
     example: Optional[str] = None
     handler: Callable
 
+    # Prompt formatting memo, stored on the template Action that handler-bound copies come from
+    _template: Optional["Action"] = PrivateAttr(default=None)
+    _prompt_key: Optional[tuple] = PrivateAttr(default=None)
+    _formatted: Optional[str] = PrivateAttr(default=None)
+
     class Config:
-        arbitrary_types_allowed = True 
\ No newline at end of file
+        arbitrary_types_allowed = True
+
+    def with_handler(self, handler: Callable) -> "Action":
+        """Return a copy bound to a different handler, sharing the static metadata."""
+        action = self.model_copy(update={"handler": handler})
+        action._template = self._template or self
+        return action 
\ No newline at end of file
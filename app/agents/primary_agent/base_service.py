@@ -4,16 +4,53 @@ Base Service Module
 Provides common utilities for service integrations including:
 - HTTP request helpers
 - Action creation
-- Input parsing
+- Input parsing and parameter validation
 - Error handling
 """
 
-import json
-import requests
-from typing import Dict, Any, Optional, Callable
+import asyncio
+import re
+import httpx
+import orjson
+from typing import Dict, Any, Optional, Callable, Iterable
 from app.agents.models import Action
 
 
+# Shared client so repeated calls to the same service host reuse pooled
+# keep-alive connections instead of paying a TCP/TLS handshake each time.
+# The transport retries failed connects; 5xx retries (idempotent methods only) are handled below.
+_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(60.0),
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64)
+    )
+)
+
+# Characters a JSON document can start with
+_JSON_START_CHARS = frozenset('{["-0123456789tfn')
+
+# key=value pairs from tool input that isn't JSON: "key=value, other='quoted, value'"
+_KV_RE = re.compile(r"""\s*([^,=]*?)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^,]*?))\s*(?=,|$)""")
+
+# Methods make_authenticated_request accepts, and the ones that carry a JSON body
+_SUPPORTED_METHODS = frozenset(("GET", "POST", "PUT", "DELETE"))
+_BODY_METHODS = frozenset(("POST", "PUT"))
+
+# 502/503/504 responses are retried for idempotent methods only; a POST may already have
+# been processed (and billed) upstream before the gateway gave up
+_RETRY_STATUSES = frozenset((502, 503, 504))
+_IDEMPOTENT_METHODS = frozenset(("GET", "PUT", "DELETE"))
+_MAX_STATUS_RETRIES = 2
+_RETRY_BACKOFF_FACTOR = 0.2
+
+
+async def close_service_client() -> None:
+    """Close the shared service HTTP client (call on application shutdown)."""
+    await _client.aclose()
+
+
 class AuthenticationError(Exception):
     """Raised when authentication fails"""
     pass
@@ -24,7 +61,15 @@ class APIError(Exception):
     pass
 
 
-def make_authenticated_request(
+class MissingParameterError(ValueError):
+    """Raised when a required tool parameter is missing or blank"""
+
+    def __init__(self, param: str):
+        super().__init__(f"{param} is required")
+        self.param = param
+
+
+async def make_authenticated_request(
     method: str,
     url: str,
     headers: Dict[str, str],
@@ -50,33 +95,35 @@ def make_authenticated_request(
         AuthenticationError: If authentication fails
         APIError: If the request fails
     """
+    method = method.upper()
+    if method not in _SUPPORTED_METHODS:
+        raise ValueError(f"Unsupported HTTP method: {method}")
+    body = data if method in _BODY_METHODS else None
+    max_retries = _MAX_STATUS_RETRIES if method in _IDEMPOTENT_METHODS else 0
+
     try:
-        if method.upper() == "GET":
-            response = requests.get(url, headers=headers, timeout=timeout)
-        elif method.upper() == "POST":
-            response = requests.post(url, headers=headers, json=data, timeout=timeout)
-        elif method.upper() == "PUT":
-            response = requests.put(url, headers=headers, json=data, timeout=timeout)
-        elif method.upper() == "DELETE":
-            response = requests.delete(url, headers=headers, timeout=timeout)
-        else:
-            raise ValueError(f"Unsupported HTTP method: {method}")
+        for attempt in range(max_retries + 1):
+            response = await _client.request(method, url, headers=headers, json=body, timeout=timeout)
+            if response.status_code not in _RETRY_STATUSES or attempt == max_retries:
+                break
+            await asyncio.sleep(_RETRY_BACKOFF_FACTOR * (2 ** attempt))
 
         if response.status_code == 401:
             raise AuthenticationError(f"{service_name} authentication failed")
         elif response.status_code == 403:
             raise AuthenticationError(f"{service_name} access forbidden")
         elif response.status_code >= 400:
-            error_detail = response.text[:200] if response.text else "Unknown error"
+            # Decode only the bytes we report instead of the whole body
+            error_detail = response.content[:200].decode("utf-8", errors="replace") if response.content else "Unknown error"
             raise APIError(f"{service_name} API error ({response.status_code}): {error_detail}")
 
-        return response.json()
+        return orjson.loads(response.content)
 
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         raise APIError(f"{service_name} request timed out")
-    except requests.exceptions.ConnectionError:
+    except httpx.TransportError:
         raise APIError(f"Failed to connect to {service_name}")
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         raise APIError(f"Invalid JSON response from {service_name}")
 
 
@@ -93,20 +140,51 @@ def parse_tool_input(input_str: str) -> Dict[str, Any]:
     if not input_str:
         return {}
 
-    # Try parsing as JSON first
-    try:
-        return json.loads(input_str)
-    except json.JSONDecodeError:
-        pass
-
-    # Try parsing as key=value pairs
-    params = {}
-    for part in input_str.split(","):
-        if "=" in part:
-            key, value = part.split("=", 1)
-            params[key.strip()] = value.strip().strip('"\'')
-
-    return params
+    # Only attempt JSON when the first character can start a JSON value (objects, arrays and
+    # scalars alike), so typical key=value input never pays for a decode error
+    stripped = input_str.lstrip()
+    if stripped[:1] in _JSON_START_CHARS:
+        try:
+            return orjson.loads(stripped)
+        except orjson.JSONDecodeError:
+            pass
+
+    # Try parsing as key=value pairs in a single pass; quoted values may contain commas
+    return {
+        match.group(1): next((value for value in match.group(2, 3, 4) if value is not None), "")
+        for match in _KV_RE.finditer(input_str)
+    }
+
+
+def extract_string_params(
+    params: Dict[str, Any],
+    required: Iterable[str],
+    optional: Iterable[str] = ()
+) -> Dict[str, str]:
+    """
+    Extract and strip string parameters from parsed tool input in one pass.
+
+    Args:
+        params: Parsed tool input
+        required: Keys that must be present as non-blank strings, checked in order
+        optional: Keys returned as stripped strings, or "" when missing or not a string
+
+    Returns:
+        Dictionary of stripped values for every required and optional key
+
+    Raises:
+        MissingParameterError: For the first required key that is missing or blank
+    """
+    fields = {}
+    for key in required:
+        value = params.get(key)
+        if not isinstance(value, str) or not (value := value.strip()):
+            raise MissingParameterError(key)
+        fields[key] = value
+    for key in optional:
+        value = params.get(key)
+        fields[key] = value.strip() if isinstance(value, str) else ""
+    return fields
 
 
 def create_service_action(
@@ -11,13 +11,15 @@ Key Features:
 - Web search via Perplexity
 """
 
+import asyncio
 import logging
+import time
 from typing import List, Optional
 from uuid import UUID
-from datetime import datetime
 
 from app.agents.base_agent import BaseAgent
 from app.agents.models import Message, Action
+from app.agents.primary_agent.base_service import AuthenticationError, APIError
 from supabase import Client as SupabaseClient
 
 from app.agents.tools.fetch_pdf_content import create_fetch_pdf_content_action
@@ -25,10 +27,18 @@ from app.agents.tools.search_pdf_documents import create_search_pdf_documents_ac
 from app.agents.tools.create_pdf import create_create_pdf_action
 from app.agents.tools.email_pdf import create_email_pdf_action
 from app.agents.tools.perplexity_tools import get_perplexity_search_action
-from app.config.config import PDF_AGENT_LLM_MODEL, PDF_AGENT_MAX_TURNS
+from app.config.config import PDF_AGENT_LLM_MODEL, PDF_AGENT_MAX_TURNS, PDF_AGENT_CONCURRENCY
 
 logger = logging.getLogger(__name__)
 
+__all__ = [
+    'PrimaryAgent',
+    'get_chat_response',
+]
+
+# Backpressure for request bursts: agent queries beyond this wait instead of piling onto the LLM APIs
+_LLM_SEM = asyncio.Semaphore(PDF_AGENT_CONCURRENCY)
+
 
 # System prompt for the PDF Agent
 PDF_AGENT_CONTEXT = """You are a helpful AI assistant. Your capabilties are outlined in the tool descriptions below.
@@ -39,6 +49,22 @@ Guidelines:
 - Keep responses concise unless the user asks for more detail
 - Always cite which PDF/page the information came from when retrieving content
 """
+# Everything around the timestamp is fixed, so split once and concatenate per request
+_INSTRUCTIONS_PREFIX, _INSTRUCTIONS_SUFFIX = PDF_AGENT_INSTRUCTIONS.split("{current_time}", 1)
+
+# (minute bucket, formatted local time); the prompt only needs minute resolution
+_ts_cache = (0, "")
+
+
+def _current_time_str() -> str:
+    """Current local time for the prompt, formatted at most once per minute."""
+    global _ts_cache
+    now = int(time.time())
+    bucket = now - (now % 60)
+    if _ts_cache[0] != bucket:
+        _ts_cache = (bucket, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(bucket)))
+    return _ts_cache[1]
+
 
 class PrimaryAgent(BaseAgent):
     """
@@ -99,9 +125,7 @@ class PrimaryAgent(BaseAgent):
         perplexity_action = get_perplexity_search_action(user_id=user_id)
 
         # Build instructions with current time
-        instructions = PDF_AGENT_INSTRUCTIONS.format(
-            current_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        )
+        instructions = _INSTRUCTIONS_PREFIX + _current_time_str() + _INSTRUCTIONS_SUFFIX
 
         # Initialize base agent
         super().__init__(
@@ -120,7 +144,7 @@ class PrimaryAgent(BaseAgent):
             agent_name="PDF Agent"
         )
 
-        logger.info(f"Initialized PDF Agent for user {user_id}")
+        logger.info("Initialized PDF Agent for user %s", user_id)
 
 
 async def get_chat_response(
@@ -161,12 +185,15 @@ async def get_chat_response(
         )
 
         # Get response from agent
-        response = await agent.query(messages, user_id, request_id, supabase)
+        async with _LLM_SEM:
+            response = await agent.query(messages, user_id, request_id, supabase)
 
-        logger.info(f"PDF Agent response generated for request {request_id}")
+        logger.info("PDF Agent response generated for request %s", request_id)
 
         return response, True, False
 
-    except Exception as e:
-        logger.error(f"Error in PDF Agent: {str(e)}")
+    except (AuthenticationError, APIError) as e:
+        # Service failures are reported to the user; anything else propagates to the
+        # chat endpoint, which marks the request failed and returns a 500
+        logger.error("Service error in PDF Agent: %s", e)
         return f"I encountered an error processing your request: {str(e)}", True, False
@@ -1,7 +1,12 @@
+import io
+import logging
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Union
 from app.agents.models import Action
 from datetime import datetime
-from app.config import USE_ONE_HOUR_CACHE
+from app.config import USE_ONE_HOUR_CACHE, MIN_CACHEABLE_TOKENS
+
+logger = logging.getLogger(__name__)
 
 
 RESPONSE_TEMPLATE = """=== Response Template ===
@@ -9,85 +14,209 @@ You must respond with valid JSON in one of the following two formats:
 
 1. When an action IS needed (calling a tool or sub-agent):
 ```json
-{{
+{
   "thought": "Your reasoning about what action to take",
   "type": "action",
-  "action": {{
+  "action": {
     "name": "action_name",
-    "parameters": {{
+    "parameters": {
       "param1": "value1",
       "param2": "value2"
-    }}
-  }}
-}}
+    }
+  }
+}
 ```
 
 Example action response:
 ```json
-{{
+{
   "thought": "The user wants to find information about CD-150 in their PDFs. I should use grep search for this specific code.",
   "type": "action",
-  "action": {{
+  "action": {
     "name": "fetch_pdf_content",
-    "parameters": {{
+    "parameters": {
       "search_type": "grep",
       "query": "CD-150"
-    }}
-  }}
-}}
+    }
+  }
+}
 ```
 
 2. When NO action or NO FURTHER ACTION is needed:
 ```json
-{{
+{
   "thought": "Your reasoning about why no action is needed",
   "type": "response",
   "response": "Your response to the user"
-}}
+}
 ```
 
 Example response:
 ```json
-{{
+{
   "thought": "I found the information about CD-150 in the search results. I can now answer the user's question.",
   "type": "response",
   "response": "CD-150 refers to the Community Corrections standard for intake procedures, which requires..."
-}}
+}
 ```
+If several independent actions are needed and none depends on another's result, "action" may be a list of action objects; they run concurrently and their observations are returned in the same order.
+
 Always output valid JSON. Only one JSON block per response.
 """
 
+def _action_key(action: Action) -> tuple:
+    """Hashable snapshot of the Action fields that format_action reads, computed once per Action."""
+    owner = action._template or action
+    if owner._prompt_key is None:
+        owner._prompt_key = _compute_action_key(action)
+    return owner._prompt_key
+
+
+def _compute_action_key(action: Action) -> tuple:
+    params = tuple(
+        (param_name, param_details.get("type", "any"), param_details.get("description", ""))
+        for param_name, param_details in action.parameters.items()
+    )
+    # Action.example is not part of the prompt, so it is left out of the key
+    return (action.name, action.description, params, action.returns)
+
+
+@lru_cache(maxsize=256)
+def _format_action_cached(name: str, description: str, params: tuple, returns: str) -> str:
+    params_str = "".join(
+        f"\n    - {param_name} ({param_type}): {param_desc}"
+        for param_name, param_type, param_desc in params
+    )
+
+    return (f"Name: {name}:\n"
+            f"Description: {description}\n"
+            f"Action Parameters:{params_str}\n"
+            f"Returns: {returns}")
+
+
 def format_action(action: Action) -> str:
     """Format a single action into a string description."""
-    action_str = [
-        f"Name: {action.name}:",
-        f"Description: {action.description}",
-        "Action Parameters:"
-    ]
+    owner = action._template or action
+    if owner._formatted is None:
+        owner._formatted = _format_action_cached(*_action_key(action))
+    return owner._formatted
+
+
+@lru_cache(maxsize=64)
+def _format_actions_block(action_keys: tuple) -> str:
+    """Fenced, blank-line separated descriptions for a whole action set."""
+    return "\n\n".join(f"```\n{_format_action_cached(*key)}\n```" for key in action_keys)
+
+
+# Prompt-cache TTL for the static system block
+_STATIC_BLOCK_TTL = "1h" if USE_ONE_HOUR_CACHE else "5m"
+
+
+@lru_cache(maxsize=8)
+def _static_tail(action_keys: tuple) -> str:
+    """Response template and actions content of the cached system block; the part shared by every context."""
+    tail = RESPONSE_TEMPLATE
+    if action_keys:
+        tail += "\n=== Available Actions ===\n\n" + _format_actions_block(action_keys)
+    return tail
+
+
+def _static_block_text(additional_context: str, action_keys: tuple) -> str:
+    """Response template, actions and context content of the cached system block."""
+    # Context goes last so the prefix shared by every agent stays byte-identical
+    return _static_tail(action_keys) + f"\n\n=== Context ===\n{additional_context}\n"
+
+
+@lru_cache(maxsize=64)
+def _static_system_block(additional_context: str, action_keys: tuple, cache_static_content: bool,
+                         min_cacheable_tokens: int = MIN_CACHEABLE_TOKENS,
+                         ttl: str = _STATIC_BLOCK_TTL) -> Dict[str, Any]:
+    """
+    The cached system block itself, shared by every request with the same key.
+
+    Handing out one object keeps the block identical across requests, which is what
+    Anthropic's prompt cache matches on. Treat it as read-only.
+    """
+    text = _static_block_text(additional_context, action_keys)
+    block = {"type": "text", "text": text}
+    if cache_static_content:
+        # ~4 characters per token; below the minimum Anthropic ignores the breakpoint anyway
+        approx_tokens = len(text) // 4
+        if approx_tokens >= min_cacheable_tokens:
+            block["cache_control"] = {"type": "ephemeral", "ttl": ttl}
+        else:
+            logger.debug(
+                "Static system block has ~%d tokens (< %d); skipping cache_control",
+                approx_tokens, min_cacheable_tokens
+            )
+    return block
+
+
+@lru_cache(maxsize=8)
+def _uncached_tail(action_keys: tuple) -> str:
+    """Response template and actions sections of the uncached system prompt, blank lines removed."""
+    prompt_sections = RESPONSE_TEMPLATE.split('\n')
+
+    if action_keys:
+        # Add available actions section
+        prompt_sections.extend([
+            "=== Available Actions ===",
+            _format_actions_block(action_keys),
+        ])
+
+    return "\n".join(section for section in prompt_sections if section)
+
+
+@lru_cache(maxsize=64)
+def _static_prompt_head(additional_context: str, action_keys: tuple) -> str:
+    """Response template, actions and context sections of the uncached system prompt."""
+    context_lines = f"=== Context ===\n{additional_context}".split('\n')
+    return _uncached_tail(action_keys) + "\n" + "\n".join(line for line in context_lines if line)
+
+
+# General Instructions section of the uncached prompt, up to the agent-specific instructions
+_UNCACHED_INSTRUCTIONS_HEADER = (
+    "=== General Instructions ===\n"
+    "- When your response to another agent includes cached data, include the cache key in your response rather than the cached content itself.  All agents have the fetch_from_cache tool.\n"
+    "=== Additional Instructions/Context ==="
+)
+
+
+# General Instructions section opening the dynamic block of the cached prompt
+_CACHED_GENERAL_INSTRUCTIONS = """
+=== General Instructions ===
+- When your response to another agent includes cached data, include the cache key in your response rather than the cached content itself.  All agents have the fetch_from_cache tool.
+"""
 
-    for param_name, param_details in action.parameters.items():
-        param_type = param_details.get("type", "any")
-        param_desc = param_details.get("description", "")
-        action_str.append(f"    - {param_name} ({param_type}): {param_desc}")
 
-    action_str.append(f"Returns: {action.returns}")
+def _write_examples(buf: io.StringIO, examples: Union[str, List[Union[str, Dict[str, str]]]]) -> None:
+    """Write examples given as a string, or a list of example strings / dictionaries."""
+    if isinstance(examples, str):
+        buf.write(examples)
+        return
 
-    if action.example:
-        # Extract just the parameters JSON from the example if it's in old format
-        example = action.example
+    for i, example in enumerate(examples):
+        if i:
+            buf.write("\n\n")
+        buf.write(f"Example {i+1}:\n\n")
+        if isinstance(example, str):
+            buf.write(example)
+        else:
+            # Handle dictionary examples
+            separator = ""
+            for key, value in example.items():
+                buf.write(f"{separator}{key}: {value}")
+                separator = "\n"
 
-        # Try to extract JSON parameters from various formats
-        if example.startswith(f'Action: {action.name}:'):
-            # Extract the JSON part after "Action: name: "
-            json_part = example.split(f'Action: {action.name}:', 1)[1].strip()
-            # Remove surrounding quotes if present
-            if json_part.startswith('"') and json_part.endswith('"'):
-                json_part = json_part[1:-1]
-            example = json_part
 
-        # action_str.append(f"Example parameters: {example}")
+def _format_examples(examples: Union[str, List[Union[str, Dict[str, str]]]]) -> str:
+    """Format examples given as a string, or a list of example strings / dictionaries."""
+    if isinstance(examples, str):
+        return examples
+    buf = io.StringIO()
+    _write_examples(buf, examples)
+    return buf.getvalue()
 
-    return "\n".join(action_str)
 
 def build_system_prompt(
     actions: List[Action],
@@ -96,7 +225,9 @@ def build_system_prompt(
     examples: Optional[Union[str, List[Union[str, Dict[str, str]]]]] = None,
     calling_agent: str = None,
     enable_caching: bool = False,
-    cache_static_content: bool = True
+    cache_static_content: bool = True,
+    cache_examples: bool = False,
+    min_cacheable_tokens: int = MIN_CACHEABLE_TOKENS
 ) -> Union[str, List[Dict[str, Any]]]:
     """
     Create a base system prompt that can be customized.
@@ -109,150 +240,86 @@ def build_system_prompt(
         calling_agent: Name of the calling agent
         enable_caching: Whether to enable Anthropic prompt caching
         cache_static_content: Whether to cache static content (actions, base instructions)
+        cache_examples: Whether examples are static across a session; if so they get their own
+            cached block (a second breakpoint) right after the static block
+        min_cacheable_tokens: Approximate token count below which the static block is sent
+            without cache_control (Anthropic's minimum cacheable prefix for the model)
         
     Returns:
         A formatted system prompt string (if caching disabled) or structured list (if caching enabled)
+
+    Both variants start with the sections that never change (response template, then
+    actions) and put additional_context after them. Anthropic's prompt cache matches on
+    an exact prefix, so anything that varies must come after the stable part.
     """
 
     if not enable_caching:
         # Original behavior - return string
         # Remove calling agent information for consistency with cached version
         
-        base_prompt = f"""=== Context ===
-{additional_context}
-
-{RESPONSE_TEMPLATE}
-
-"""
-
-        # Convert base prompt to list of lines
-        prompt_sections = base_prompt.split('\n')
-
-        if actions:
-            # Add available actions section
-            prompt_sections.extend([
-                "",
-                "=== Available Actions ===",
-                "",
-                "\n\n".join(f"```\n{format_action(action)}\n```" for action in actions),
-                "",
-            ])
+        # Context, response template and actions only change with the agent definition.
+        # Only non-empty sections are appended, so a single join produces the prompt.
+        prompt_sections = [
+            _static_prompt_head(additional_context, tuple(_action_key(action) for action in actions or ())),
+            _UNCACHED_INSTRUCTIONS_HEADER
+        ]
+        append = prompt_sections.append
 
-        # Add instructions section after available actions
-        prompt_sections.extend([
-            "",
-            "=== General Instructions ===",
-            "- When your response to another agent includes cached data, include the cache key in your response rather than the cached content itself.  All agents have the fetch_from_cache tool.",
-            "",
-            "=== Additional Instructions/Context ===",
-            f"{general_instructions}",
-            "",
-        ])
+        instructions = f"{general_instructions}"
+        if instructions:
+            append(instructions)
 
         # Add examples if provided
         if examples:
-            prompt_sections.extend([
-                "",
-                "=== Examples of Full Flow ===",
-                "",
-            ])
-            
-            if isinstance(examples, str):
-                prompt_sections.append(examples)
-            else:
-                # Format the list of examples
-                formatted_examples = []
-                for i, example in enumerate(examples):
-                    formatted_examples.append(f"Example {i+1}:")
-                    if isinstance(example, str):
-                        formatted_examples.append(example)
-                    else:
-                        # Handle dictionary examples
-                        formatted_example = []
-                        for key, value in example.items():
-                            formatted_example.append(f"{key}: {value}")
-                        formatted_examples.append("\n".join(formatted_example))
-                prompt_sections.append("\n\n".join(formatted_examples))
-            
-            prompt_sections.append("")
-
-        # Combine all sections, filtering out empty strings
-        return "\n".join(section for section in prompt_sections if section)
+            append("=== Examples of Full Flow ===")
+            formatted_examples = _format_examples(examples)
+            if formatted_examples:
+                append(formatted_examples)
+
+        return "\n".join(prompt_sections)
     
     else:
         # Caching enabled - return structured format
         # Consolidate static content into single cached block for maximum cache efficiency
         system_blocks = []
         
-        # Combine all static content into one cached block: Context, Response Template, Actions
-        static_content_parts = []
-        
-        # 1. Context (now static without calling agent info)
-        static_content_parts.append(f"=== Context ===\n{additional_context}")
-        
-        # 2. Response Template (static)
-        response_template = f"""{RESPONSE_TEMPLATE}
-"""
-        static_content_parts.append(response_template)
-        
-        # 3. Available Actions (static)
-        if actions:
-            actions_content = "\n=== Available Actions ===\n\n" + "\n\n".join(f"```\n{format_action(action)}\n```" for action in actions)
-            static_content_parts.append(actions_content)
-        
-        # Add all static content as single cached block
-        combined_static_content = "\n".join(static_content_parts)
+        # Context, Response Template and Actions only change with the agent definition,
+        # so the block is built (and serialized) once per unique agent setup
+        system_blocks.append(_static_system_block(
+            additional_context,
+            tuple(_action_key(action) for action in actions or ()),
+            cache_static_content,
+            min_cacheable_tokens
+        ))
         
-        if cache_static_content:
+        # Examples that stay fixed for the session get a second breakpoint, placed before any
+        # uncached content so they extend the cached prefix. Same TTL as the static block and the
+        # history breakpoint, since Anthropic requires longer TTLs to come before shorter ones.
+        if examples and cache_examples:
+            examples_buf = io.StringIO()
+            examples_buf.write("=== Examples of Full Flow ===\n\n")
+            _write_examples(examples_buf, examples)
             system_blocks.append({
                 "type": "text",
-                "text": combined_static_content,
-                "cache_control": {"type": "ephemeral", "ttl": "1h" if USE_ONE_HOUR_CACHE else "5m"}
+                "text": examples_buf.getvalue(),
+                "cache_control": {"type": "ephemeral", "ttl": _STATIC_BLOCK_TTL}
             })
-        else:
-            system_blocks.append({
-                "type": "text",
-                "text": combined_static_content
-            })
-        
+            examples = None
+
         # 4. Dynamic content: General Instructions + Agent Specific Instructions (not cached)
-        dynamic_content_parts = []
-        
-        general_instructions_content = """
-=== General Instructions ===
-- When your response to another agent includes cached data, include the cache key in your response rather than the cached content itself.  All agents have the fetch_from_cache tool.
-"""
-        dynamic_content_parts.append(general_instructions_content)
+        buf = io.StringIO()
+        buf.write(_CACHED_GENERAL_INSTRUCTIONS)
         
         # 5. Agent Specific Instructions (dynamic)
-        agent_instructions_content = f"\n=== Additional Instructions/Context ===\n{general_instructions}\n"
-        dynamic_content_parts.append(agent_instructions_content)
+        buf.write(f"\n\n=== Additional Instructions/Context ===\n{general_instructions}\n")
         
         # 6. Examples (if provided, add to dynamic content since they may vary by request)
         if examples:
-            examples_content = "\n=== Examples of Full Flow ===\n\n"
-            
-            if isinstance(examples, str):
-                examples_content += examples
-            else:
-                # Format the list of examples
-                formatted_examples = []
-                for i, example in enumerate(examples):
-                    formatted_examples.append(f"Example {i+1}:")
-                    if isinstance(example, str):
-                        formatted_examples.append(example)
-                    else:
-                        # Handle dictionary examples
-                        formatted_example = []
-                        for key, value in example.items():
-                            formatted_example.append(f"{key}: {value}")
-                        formatted_examples.append("\n".join(formatted_example))
-                examples_content += "\n\n".join(formatted_examples)
-            
-            dynamic_content_parts.append(examples_content)
+            buf.write("\n\n=== Examples of Full Flow ===\n\n")
+            _write_examples(buf, examples)
         
         # Add all dynamic content as single uncached block
-        combined_dynamic_content = "\n".join(dynamic_content_parts)
+        combined_dynamic_content = buf.getvalue()
         system_blocks.append({
             "type": "text",
             "text": combined_dynamic_content
@@ -260,3 +327,34 @@ def build_system_prompt(
 
         return system_blocks
 
+
+def apply_history_cache_control(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Return messages with a cache breakpoint on the second-to-last history message.
+
+    With the system blocks' breakpoints this caches the conversation prefix, so only
+    the newest turn is billed as uncached input. Anthropic allows at most 4 breakpoints,
+    so any other non-system breakpoint is dropped. Returns a shallow copy; the input
+    list and its messages are left untouched.
+    """
+    history_indices = [i for i, msg in enumerate(messages) if msg["role"] != "system"]
+    if len(history_indices) < 2:
+        return messages
+
+    breakpoint_index = history_indices[-2]
+    cache_control = {"type": "ephemeral", "ttl": _STATIC_BLOCK_TTL}
+    marked = []
+    for i, msg in enumerate(messages):
+        content = msg["content"]
+        if i == breakpoint_index:
+            if isinstance(content, list):
+                blocks = [{k: v for k, v in block.items() if k != "cache_control"} for block in content]
+            else:
+                blocks = [{"type": "text", "text": content}]
+            blocks[-1]["cache_control"] = cache_control
+            msg = {**msg, "content": blocks}
+        elif msg["role"] != "system" and isinstance(content, list):
+            msg = {**msg, "content": [{k: v for k, v in block.items() if k != "cache_control"} for block in content]}
+        marked.append(msg)
+
+    return marked
@@ -17,7 +17,8 @@ from app.agents.tools.create_pdf import (
 )
 from app.agents.tools.email_pdf import (
     create_email_pdf_action,
-    email_pdf_handler
+    email_pdf_handler,
+    validate_emails
 )
 
 __all__ = [
@@ -27,4 +28,5 @@ __all__ = [
     'create_pdf_handler',
     'create_email_pdf_action',
     'email_pdf_handler',
+    'validate_emails',
 ]
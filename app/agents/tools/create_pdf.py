@@ -4,17 +4,26 @@ Create PDF Tool
 Agent tool for generating PDF documents (summaries and reports).
 """
 
-import json
 import logging
+import orjson
+from functools import partial
 from typing import Dict, Any, Optional
 
 from supabase import Client as SupabaseClient
 
 from app.agents.models import Action
+from app.agents.primary_agent.base_service import extract_string_params, MissingParameterError
 from app.services.pdf_generator import pdf_generator_service
 
 logger = logging.getLogger(__name__)
 
+_VALID_CONTENT_TYPES = frozenset(("summary", "report"))
+
+_REQUIRED_FIELD_ERRORS = {
+    "title": "Title is required",
+    "content": "Content is required"
+}
+
 
 async def create_pdf(
     params: Dict[str, Any],
@@ -39,31 +48,27 @@ async def create_pdf(
         JSON string with creation result including PDF ID
     """
     try:
-        title = params.get("title", "").strip()
-        content = params.get("content", "").strip()
-        content_type = params.get("content_type", "summary").lower()
-        source_pdf_ids = params.get("source_pdf_ids", [])
-
         # Validate required fields
-        if not title:
-            return json.dumps({
+        try:
+            fields = extract_string_params(params, ("title", "content"), ("content_type",))
+        except MissingParameterError as e:
+            return orjson.dumps({
                 "success": False,
-                "error": "Title is required"
-            })
+                "error": _REQUIRED_FIELD_ERRORS[e.param]
+            }).decode()
 
-        if not content:
-            return json.dumps({
-                "success": False,
-                "error": "Content is required"
-            })
+        title = fields["title"]
+        content = fields["content"]
+        content_type = (fields["content_type"] or "summary").lower()
+        source_pdf_ids = params.get("source_pdf_ids") or []
 
-        if content_type not in ["summary", "report"]:
-            return json.dumps({
+        if content_type not in _VALID_CONTENT_TYPES:
+            return orjson.dumps({
                 "success": False,
                 "error": f"Invalid content_type: {content_type}. Use 'summary' or 'report'."
-            })
+            }).decode()
 
-        logger.info(f"Creating PDF for user {user_id}: {title}")
+        logger.info("Creating PDF for user %s: %s", user_id, title)
 
         # Create and store the PDF
         result = await pdf_generator_service.create_and_store_pdf(
@@ -76,28 +81,28 @@ async def create_pdf(
         )
 
         if result.get('success'):
-            logger.info(f"Successfully created PDF: {result.get('pdf_id')}")
-            return json.dumps({
+            logger.info("Successfully created PDF: %s", result.get('pdf_id'))
+            return orjson.dumps({
                 "success": True,
                 "message": f"PDF '{title}' created successfully",
                 "pdf_id": result.get('pdf_id'),
                 "filename": result.get('filename'),
                 "size_bytes": result.get('size_bytes'),
                 "content_type": content_type
-            }, indent=2)
+            }).decode()
         else:
-            logger.error(f"Failed to create PDF: {result.get('error')}")
-            return json.dumps({
+            logger.error("Failed to create PDF: %s", result.get('error'))
+            return orjson.dumps({
                 "success": False,
                 "error": result.get('error', 'Unknown error creating PDF')
-            })
+            }).decode()
 
     except Exception as e:
-        logger.error(f"Error creating PDF: {str(e)}")
-        return json.dumps({
+        logger.exception("Error creating PDF")
+        return orjson.dumps({
             "success": False,
             "error": f"Failed to create PDF: {str(e)}"
-        })
+        }).decode()
 
 
 async def create_pdf_handler(
@@ -119,16 +124,45 @@ async def create_pdf_handler(
         JSON string with results
     """
     try:
-        params = json.loads(input_str) if isinstance(input_str, str) else input_str
-    except json.JSONDecodeError:
-        return json.dumps({
+        params = orjson.loads(input_str) if isinstance(input_str, str) else input_str
+    except orjson.JSONDecodeError:
+        return orjson.dumps({
             "success": False,
             "error": "Invalid JSON input. Expected: {title, content, content_type}"
-        })
+        }).decode()
 
     return await create_pdf(params, user_id, supabase, request_id)
 
 
+# Static action metadata; each request only binds its own handler
+_CREATE_PDF_ACTION = Action(
+    name="create_pdf",
+    description="Create a new PDF document containing a summary or report. Use this to generate documents from content you've gathered or created during the conversation.",
+    parameters={
+        "title": {
+            "type": "string",
+            "description": "Title for the PDF document"
+        },
+        "content": {
+            "type": "string",
+            "description": "The text content to include in the PDF. Supports basic markdown formatting (headers with #, bullet points with -)."
+        },
+        "content_type": {
+            "type": "string",
+            "description": "Type of document: 'summary' for brief summaries, 'report' for detailed reports. Default: 'summary'",
+            "enum": ["summary", "report"]
+        },
+        "source_pdf_ids": {
+            "type": "array",
+            "description": "Optional list of PDF IDs that were used as sources for this document"
+        }
+    },
+    returns="JSON object with success status, PDF ID, and filename. The PDF ID can be used with email_pdf to send the document.",
+    example='Action: create_pdf: {"title": "Research Summary", "content": "# Key Findings\\n- Point 1\\n- Point 2", "content_type": "summary"}',
+    handler=create_pdf_handler
+)
+
+
 def create_create_pdf_action(
     user_id: str,
     supabase: SupabaseClient,
@@ -145,33 +179,6 @@ def create_create_pdf_action(
     Returns:
         Action object configured for PDF creation
     """
-    async def handler_wrapper(input_str: str) -> str:
-        """Async wrapper for create_pdf_handler."""
-        return await create_pdf_handler(input_str, user_id, supabase, request_id)
-
-    return Action(
-        name="create_pdf",
-        description="Create a new PDF document containing a summary or report. Use this to generate documents from content you've gathered or created during the conversation.",
-        parameters={
-            "title": {
-                "type": "string",
-                "description": "Title for the PDF document"
-            },
-            "content": {
-                "type": "string",
-                "description": "The text content to include in the PDF. Supports basic markdown formatting (headers with #, bullet points with -)."
-            },
-            "content_type": {
-                "type": "string",
-                "description": "Type of document: 'summary' for brief summaries, 'report' for detailed reports. Default: 'summary'",
-                "enum": ["summary", "report"]
-            },
-            "source_pdf_ids": {
-                "type": "array",
-                "description": "Optional list of PDF IDs that were used as sources for this document"
-            }
-        },
-        returns="JSON object with success status, PDF ID, and filename. The PDF ID can be used with email_pdf to send the document.",
-        example='Action: create_pdf: {"title": "Research Summary", "content": "# Key Findings\\n- Point 1\\n- Point 2", "content_type": "summary"}',
-        handler=handler_wrapper
+    return _CREATE_PDF_ACTION.with_handler(
+        partial(create_pdf_handler, user_id=user_id, supabase=supabase, request_id=request_id)
     )
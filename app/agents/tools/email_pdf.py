@@ -4,24 +4,61 @@ Email PDF Tool
 Agent tool for sending PDF documents via email.
 """
 
-import json
+import asyncio
 import logging
+import orjson
 import re
-from typing import Dict, Any, Optional
+from functools import lru_cache, partial
+from typing import Dict, Any, Iterable, List, Optional
 
 from supabase import Client as SupabaseClient
 
 from app.agents.models import Action
+from app.agents.primary_agent.base_service import extract_string_params, MissingParameterError
 from app.services.pdf_generator import pdf_generator_service
 from app.services.email_service import email_service
 
 logger = logging.getLogger(__name__)
 
 
+# \Z rather than $ so a trailing newline is not accepted
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}\Z')
+
+
+# Anything other than letters, digits, space, '-' and '_' (\w is Unicode-aware, like str.isalnum)
+_UNSAFE_TITLE_CHARS_RE = re.compile(r'[^\w \-]+')
+
+_REQUIRED_FIELD_ERRORS = {
+    "pdf_id": "pdf_id is required. Use create_pdf first to generate a PDF.",
+    "recipient_email": "recipient_email is required. Please ask the user for their email address.",
+    "recipient_name": "recipient_name is required. Please ask the user for their name."
+}
+
+
+@lru_cache(maxsize=1024)
 def _validate_email(email: str) -> bool:
     """Basic email validation."""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
+    # Cheap structural checks reject most malformed input before the regex runs;
+    # none of them can reject an address the regex would accept ("a@b.co" is the shortest)
+    if len(email) < 6 or "@" not in email:
+        return False
+    local, _, domain = email.rpartition("@")
+    if not local or "." not in domain:
+        return False
+    return _EMAIL_RE.match(email) is not None
+
+
+def validate_emails(emails: Iterable[str]) -> List[bool]:
+    """
+    Validate several email addresses at once.
+
+    Args:
+        emails: Email addresses to check
+
+    Returns:
+        One result per address, in input order
+    """
+    return list(map(_validate_email, emails))
 
 
 async def email_pdf(
@@ -48,64 +85,63 @@ async def email_pdf(
         JSON string with send result
     """
     try:
-        pdf_id = params.get("pdf_id", "").strip()
-        recipient_email = params.get("recipient_email", "").strip()
-        recipient_name = params.get("recipient_name", "").strip()
-        subject = params.get("subject", "").strip()
-        message = params.get("message", "").strip()
-
         # Validate required fields
-        if not pdf_id:
-            return json.dumps({
-                "success": False,
-                "error": "pdf_id is required. Use create_pdf first to generate a PDF."
-            })
-
-        if not recipient_email:
-            return json.dumps({
+        try:
+            fields = extract_string_params(
+                params,
+                ("pdf_id", "recipient_email", "recipient_name"),
+                ("subject", "message")
+            )
+        except MissingParameterError as e:
+            return orjson.dumps({
                 "success": False,
-                "error": "recipient_email is required. Please ask the user for their email address."
-            })
+                "error": _REQUIRED_FIELD_ERRORS[e.param]
+            }).decode()
 
-        if not recipient_name:
-            return json.dumps({
-                "success": False,
-                "error": "recipient_name is required. Please ask the user for their name."
-            })
+        pdf_id = fields["pdf_id"]
+        recipient_email = fields["recipient_email"]
+        recipient_name = fields["recipient_name"]
+        subject = fields["subject"]
+        message = fields["message"]
 
         if not _validate_email(recipient_email):
-            return json.dumps({
+            return orjson.dumps({
                 "success": False,
                 "error": f"Invalid email address format: {recipient_email}"
-            })
+            }).decode()
 
-        logger.info(f"Emailing PDF {pdf_id} to {recipient_email} for user {user_id}")
+        logger.info("Emailing PDF %s to %s for user %s", pdf_id, recipient_email, user_id)
 
-        # Get the PDF record to get title and filename
-        pdf_record = supabase.from_('generated_pdfs').select(
-            'title, storage_path'
-        ).eq('id', pdf_id).eq('user_id', user_id).execute()
+        # Get the PDF record to get title and filename; the sync client call
+        # runs in a worker thread so it doesn't block the event loop
+        pdf_record = await asyncio.to_thread(
+            supabase.from_('generated_pdfs').select(
+                'title, storage_path'
+            ).eq('id', pdf_id).eq('user_id', user_id).execute
+        )
 
         if not pdf_record.data:
-            return json.dumps({
+            return orjson.dumps({
                 "success": False,
                 "error": f"PDF {pdf_id} not found or not owned by user"
-            })
+            }).decode()
 
         pdf_title = pdf_record.data[0].get('title', 'Document')
 
-        # Download the PDF bytes
+        # Download the PDF bytes, reusing the storage path from the record above
+        # instead of letting get_pdf_bytes look it up again
         pdf_bytes = await pdf_generator_service.get_pdf_bytes(
             pdf_id=pdf_id,
             user_id=user_id,
-            supabase=supabase
+            supabase=supabase,
+            storage_path=pdf_record.data[0]['storage_path']
         )
 
         if not pdf_bytes:
-            return json.dumps({
+            return orjson.dumps({
                 "success": False,
                 "error": "Failed to retrieve PDF file"
-            })
+            }).decode()
 
         # Set defaults for optional fields
         if not subject:
@@ -115,7 +151,7 @@ async def email_pdf(
             message = f"Please find attached the document: {pdf_title}"
 
         # Generate filename
-        safe_title = "".join(c for c in pdf_title if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        safe_title = _UNSAFE_TITLE_CHARS_RE.sub('', pdf_title).rstrip()
         pdf_filename = f"{safe_title[:50]}.pdf"
 
         # Send the email
@@ -132,27 +168,27 @@ async def email_pdf(
         )
 
         if result.get('success'):
-            logger.info(f"Successfully sent email to {recipient_email}")
-            return json.dumps({
+            logger.info("Successfully sent email to %s", recipient_email)
+            return orjson.dumps({
                 "success": True,
                 "message": f"Email sent successfully to {recipient_name} at {recipient_email}",
                 "email_id": result.get('email_id'),
                 "recipient": recipient_email,
                 "pdf_title": pdf_title
-            }, indent=2)
+            }).decode()
         else:
-            logger.error(f"Failed to send email: {result.get('error')}")
-            return json.dumps({
+            logger.error("Failed to send email: %s", result.get('error'))
+            return orjson.dumps({
                 "success": False,
                 "error": result.get('error', 'Unknown error sending email')
-            })
+            }).decode()
 
     except Exception as e:
-        logger.error(f"Error emailing PDF: {str(e)}")
-        return json.dumps({
+        logger.exception("Error emailing PDF")
+        return orjson.dumps({
             "success": False,
             "error": f"Failed to email PDF: {str(e)}"
-        })
+        }).decode()
 
 
 async def email_pdf_handler(
@@ -174,16 +210,48 @@ async def email_pdf_handler(
         JSON string with results
     """
     try:
-        params = json.loads(input_str) if isinstance(input_str, str) else input_str
-    except json.JSONDecodeError:
-        return json.dumps({
+        params = orjson.loads(input_str) if isinstance(input_str, str) else input_str
+    except orjson.JSONDecodeError:
+        return orjson.dumps({
             "success": False,
             "error": "Invalid JSON input. Expected: {pdf_id, recipient_email, recipient_name, subject?, message?}"
-        })
+        }).decode()
 
     return await email_pdf(params, user_id, supabase, request_id)
 
 
+# Static action metadata; each request only binds its own handler
+_EMAIL_PDF_ACTION = Action(
+    name="email_pdf",
+    description="Send a PDF document to a recipient via email. You will need the user's name and email so if you don't it, please ask them. Use create_pdf first to generate the document, then use this tool to send it.",
+    parameters={
+        "pdf_id": {
+            "type": "string",
+            "description": "ID of the PDF to send (obtained from create_pdf tool)"
+        },
+        "recipient_email": {
+            "type": "string",
+            "description": "Email address of the recipient"
+        },
+        "recipient_name": {
+            "type": "string",
+            "description": "Name of the recipient"
+        },
+        "subject": {
+            "type": "string",
+            "description": "Optional email subject line. Defaults to the PDF title."
+        },
+        "message": {
+            "type": "string",
+            "description": "Optional message to include in the email body"
+        }
+    },
+    returns="JSON object with success status and email ID",
+    example='Action: email_pdf: {"pdf_id": "abc123-def456", "recipient_email": "user@example.com", "recipient_name": "John Doe", "subject": "Your requested document"}',
+    handler=email_pdf_handler
+)
+
+
 def create_email_pdf_action(
     user_id: str,
     supabase: SupabaseClient,
@@ -200,36 +268,6 @@ def create_email_pdf_action(
     Returns:
         Action object configured for PDF emailing
     """
-    async def handler_wrapper(input_str: str) -> str:
-        """Async wrapper for email_pdf_handler."""
-        return await email_pdf_handler(input_str, user_id, supabase, request_id)
-
-    return Action(
-        name="email_pdf",
-        description="Send a PDF document to a recipient via email. You will need the user's name and email so if you don't it, please ask them. Use create_pdf first to generate the document, then use this tool to send it.",
-        parameters={
-            "pdf_id": {
-                "type": "string",
-                "description": "ID of the PDF to send (obtained from create_pdf tool)"
-            },
-            "recipient_email": {
-                "type": "string",
-                "description": "Email address of the recipient"
-            },
-            "recipient_name": {
-                "type": "string",
-                "description": "Name of the recipient"
-            },
-            "subject": {
-                "type": "string",
-                "description": "Optional email subject line. Defaults to the PDF title."
-            },
-            "message": {
-                "type": "string",
-                "description": "Optional message to include in the email body"
-            }
-        },
-        returns="JSON object with success status and email ID",
-        example='Action: email_pdf: {"pdf_id": "abc123-def456", "recipient_email": "user@example.com", "recipient_name": "John Doe", "subject": "Your requested document"}',
-        handler=handler_wrapper
+    return _EMAIL_PDF_ACTION.with_handler(
+        partial(email_pdf_handler, user_id=user_id, supabase=supabase, request_id=request_id)
     )
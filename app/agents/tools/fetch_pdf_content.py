@@ -7,6 +7,7 @@ Supports semantic search (vector similarity) and grep search (text pattern match
 
 import json
 import logging
+from functools import partial
 from typing import Dict, Any, Optional
 from uuid import UUID
 
@@ -155,6 +156,35 @@ async def fetch_pdf_content_handler(
     return await fetch_pdf_content(params, user_id, supabase, request_id)
 
 
+# Static action metadata; each request only binds its own handler
+_FETCH_PDF_CONTENT_ACTION = Action(
+    name="fetch_pdf_content",
+    description="Search and retrieve content from uploaded PDF documents. Use 'semantic' search for natural language queries about topics or concepts. Use 'grep' search for specific terms, codes, or exact text patterns.",
+    parameters={
+        "search_type": {
+            "type": "string",
+            "description": "Search method: 'semantic' for natural language similarity search, 'grep' for exact text pattern matching. Default: 'semantic'",
+            "enum": ["semantic", "grep"]
+        },
+        "query": {
+            "type": "string",
+            "description": "Search query - for semantic: describe what you're looking for; for grep: the exact text pattern to find"
+        },
+        "pdf_id": {
+            "type": "string",
+            "description": "Optional: Specific PDF ID to search within. If not provided, searches all user's PDFs."
+        },
+        "max_results": {
+            "type": "integer",
+            "description": "Maximum number of results to return. Default: 5"
+        }
+    },
+    returns="JSON object with search results containing page content, page numbers, and relevance scores",
+    example='Action: fetch_pdf_content: {"search_type": "semantic", "query": "information about AI iterations and human intervention"}',
+    handler=fetch_pdf_content_handler
+)
+
+
 def create_fetch_pdf_content_action(
     user_id: str,
     supabase: SupabaseClient,
@@ -171,33 +201,6 @@ def create_fetch_pdf_content_action(
     Returns:
         Action object configured for PDF content fetching
     """
-    async def handler_wrapper(input_str: str) -> str:
-        """Async wrapper for fetch_pdf_content_handler."""
-        return await fetch_pdf_content_handler(input_str, user_id, supabase, request_id)
-
-    return Action(
-        name="fetch_pdf_content",
-        description="Search and retrieve content from uploaded PDF documents. Use 'semantic' search for natural language queries about topics or concepts. Use 'grep' search for specific terms, codes, or exact text patterns.",
-        parameters={
-            "search_type": {
-                "type": "string",
-                "description": "Search method: 'semantic' for natural language similarity search, 'grep' for exact text pattern matching. Default: 'semantic'",
-                "enum": ["semantic", "grep"]
-            },
-            "query": {
-                "type": "string",
-                "description": "Search query - for semantic: describe what you're looking for; for grep: the exact text pattern to find"
-            },
-            "pdf_id": {
-                "type": "string",
-                "description": "Optional: Specific PDF ID to search within. If not provided, searches all user's PDFs."
-            },
-            "max_results": {
-                "type": "integer",
-                "description": "Maximum number of results to return. Default: 5"
-            }
-        },
-        returns="JSON object with search results containing page content, page numbers, and relevance scores",
-        example='Action: fetch_pdf_content: {"search_type": "semantic", "query": "information about AI iterations and human intervention"}',
-        handler=handler_wrapper
+    return _FETCH_PDF_CONTENT_ACTION.with_handler(
+        partial(fetch_pdf_content_handler, user_id=user_id, supabase=supabase, request_id=request_id)
     )
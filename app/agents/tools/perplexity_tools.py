@@ -10,6 +10,7 @@ Provides Perplexity AI functionality for AI agents including:
 
 import json
 import os
+from functools import partial
 from typing import Dict, Any, List, Optional
 from dotenv import load_dotenv
 from app.agents.models import Action
@@ -128,7 +129,7 @@ async def search_web(params: Dict[str, Any], user_id: UUID = None) -> str:
             "frequency_penalty": float(params.get("frequency_penalty", 1))
         }
         
-        response = make_authenticated_request(
+        response = await make_authenticated_request(
             "POST",
             f"{BASE_URL}/chat/completions",
             headers,
@@ -170,18 +171,22 @@ async def search_web_handler(input_str: str, user_id: str = None) -> str:
     return await search_web(params, user_uuid)
 
 
+# Static action metadata; each request only binds its own handler
+_PERPLEXITY_SEARCH_ACTION = create_service_action(
+    name="perplexity_search",
+    description="Perform a general web search using Perplexity AI. Use this to find information that may not be in the uploaded PDFs.",
+    parameters={
+        "query": {"type": "string", "description": "Search query"},
+        "max_tokens": {"type": "integer", "description": "Maximum tokens (default: 2000, max: 4000)"},
+        "temperature": {"type": "number", "description": "Temperature (0.0-2.0, default: 0.1)"},
+        "system_prompt": {"type": "string", "description": "System prompt for the model"}
+    },
+    returns="JSON object with search results and citations",
+    handler_func=search_web_handler,
+    example='Action: perplexity_search: {"query": "latest research on renewable energy"}'
+)
+
+
 def get_perplexity_search_action(user_id: str = None) -> Action:
     """Get the Perplexity search action for the PDF agent."""
-    return create_service_action(
-        name="perplexity_search",
-        description="Perform a general web search using Perplexity AI. Use this to find information that may not be in the uploaded PDFs.",
-        parameters={
-            "query": {"type": "string", "description": "Search query"},
-            "max_tokens": {"type": "integer", "description": "Maximum tokens (default: 2000, max: 4000)"},
-            "temperature": {"type": "number", "description": "Temperature (0.0-2.0, default: 0.1)"},
-            "system_prompt": {"type": "string", "description": "System prompt for the model"}
-        },
-        returns="JSON object with search results and citations",
-        handler_func=lambda input_str: search_web_handler(input_str, user_id),
-        example='Action: perplexity_search: {"query": "latest research on renewable energy"}'
-    )
\ No newline at end of file
+    return _PERPLEXITY_SEARCH_ACTION.with_handler(partial(search_web_handler, user_id=user_id))
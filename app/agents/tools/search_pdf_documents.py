@@ -7,6 +7,7 @@ Returns document information like ID, filename, number of pages, etc.
 
 import json
 import logging
+from functools import partial
 from typing import Dict, Any, Optional
 from uuid import UUID
 
@@ -125,6 +126,26 @@ async def search_pdf_documents_handler(
     return await search_pdf_documents(params, user_id, supabase, request_id)
 
 
+# Static action metadata; each request only binds its own handler
+_SEARCH_PDF_DOCUMENTS_ACTION = Action(
+    name="search_pdf_documents",
+    description="Search for PDF documents by filename. Returns document metadata including document ID, filename, number of pages, and file size. Use this to find which PDFs are available before searching their content with fetch_pdf_content.",
+    parameters={
+        "filename_query": {
+            "type": "string",
+            "description": "Search term to match against PDF filenames (case-insensitive partial match)"
+        },
+        "max_results": {
+            "type": "integer",
+            "description": "Maximum number of results to return. Default: 10"
+        }
+    },
+    returns="JSON object with document metadata including document_id, filename, title, num_pages, file_size_bytes, status, and created_at",
+    example='Action: search_pdf_documents: {"filename_query": "report"}',
+    handler=search_pdf_documents_handler
+)
+
+
 def create_search_pdf_documents_action(
     user_id: str,
     supabase: SupabaseClient,
@@ -141,24 +162,6 @@ def create_search_pdf_documents_action(
     Returns:
         Action object configured for PDF document search
     """
-    async def handler_wrapper(input_str: str) -> str:
-        """Async wrapper for search_pdf_documents_handler."""
-        return await search_pdf_documents_handler(input_str, user_id, supabase, request_id)
-
-    return Action(
-        name="search_pdf_documents",
-        description="Search for PDF documents by filename. Returns document metadata including document ID, filename, number of pages, and file size. Use this to find which PDFs are available before searching their content with fetch_pdf_content.",
-        parameters={
-            "filename_query": {
-                "type": "string",
-                "description": "Search term to match against PDF filenames (case-insensitive partial match)"
-            },
-            "max_results": {
-                "type": "integer",
-                "description": "Maximum number of results to return. Default: 10"
-            }
-        },
-        returns="JSON object with document metadata including document_id, filename, title, num_pages, file_size_bytes, status, and created_at",
-        example='Action: search_pdf_documents: {"filename_query": "report"}',
-        handler=handler_wrapper
+    return _SEARCH_PDF_DOCUMENTS_ACTION.with_handler(
+        partial(search_pdf_documents_handler, user_id=user_id, supabase=supabase, request_id=request_id)
     )
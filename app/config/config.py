@@ -20,6 +20,21 @@ GEMINI_2_5_FLASH = "gemini-2.5-flash"  # $0.075,$0.30/M I/O
 CACHE_CONTENT_THRESHOLD = 1000
 CACHE_MAX_CHARS = 15000  # Maximum characters to store in cache
 USE_ONE_HOUR_CACHE = True  # Use 1-hour cache TTL (2x write cost) vs 5-minute (1.25x write cost)
+MIN_CACHEABLE_TOKENS = 1024  # Anthropic won't cache a prefix shorter than this; skip the breakpoint below it
+MIN_CACHEABLE_TOKENS_HAIKU = 2048  # Haiku models need a longer prefix before caching applies
+
+# Semantic Response Cache Configuration (opt-in per agent via enable_semantic_cache)
+SEMANTIC_CACHE_SIMILARITY_THRESHOLD = 0.95  # Minimum cosine similarity to serve a cached response
+SEMANTIC_CACHE_MAX_ENTRIES = 1000  # Entries kept across all scopes before oldest are evicted
+SEMANTIC_CACHE_TTL_MINUTES = 30
+
+# Provider Concurrency Limits (max in-flight requests per provider; further calls queue client-side)
+PROVIDER_MAX_CONCURRENCY = {
+    "anthropic": int(os.getenv("ANTHROPIC_MAX_CONCURRENCY", "50")),
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "100")),
+    "google": int(os.getenv("GEMINI_MAX_CONCURRENCY", "50")),
+    "xai": int(os.getenv("XAI_MAX_CONCURRENCY", "50")),
+}
 
 # System Configuration
 SYSTEM_MODEL = SONNET_4_5
@@ -31,9 +46,11 @@ SERVICE_TOOL_MAX_TIMEOUT = 3600  # seconds - maximum allowed timeout
 # PDF Agent Configuration
 PDF_AGENT_LLM_MODEL = HAIKU_4_5
 PDF_AGENT_MAX_TURNS = 16
+PDF_AGENT_CONCURRENCY = int(os.getenv("PDF_AGENT_CONCURRENCY", "8"))  # Max concurrent agent queries per worker
 PDF_SIMILARITY_THRESHOLD = 0.3  # Minimum similarity score for semantic search
 PDF_SEMANTIC_SEARCH_MAX_RESULTS = 5  # Max results from semantic search
 PDF_MAX_FILE_SIZE_MB = 50  # Maximum PDF file size in MB
+PDF_BYTES_CACHE_MAX_MB = int(os.getenv("PDF_BYTES_CACHE_MAX_MB", "64"))  # Memory budget for recently downloaded PDFs per worker
 
 # Email Configuration
 SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
@@ -229,7 +229,7 @@ async def chat_endpoint(
                 logger.info(f"Processing image URL: {image_url}")
                 
                 # Process image with vision model
-                extracted_info = process_image_with_vision(request_data.message, image_url)
+                extracted_info = await process_image_with_vision(request_data.message, image_url)
                 if extracted_info:
                     image_content = "Additional context from user provided image: " + extracted_info
                     logger.info(f"Enhanced user message with image context: {len(extracted_info)} characters")
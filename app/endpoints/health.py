@@ -9,6 +9,7 @@ import time
 from app.utils.supabase_singleton import supabase_health_check, get_supabase_stats
 from app.utils.connection_monitor import get_connection_health, get_connection_stats
 from app.utils.circuit_breaker import get_circuit_breaker
+from app.agents.model_providers import get_provider_breaker_status, get_provider_concurrency_status
 
 router = APIRouter()
 
@@ -147,7 +148,9 @@ async def circuit_breaker_status() -> Dict[str, Any]:
         
         return {
             "timestamp": time.time(),
-            "circuit_breakers": status
+            "circuit_breakers": status,
+            "provider_circuit_breakers": get_provider_breaker_status(),
+            "provider_concurrency": get_provider_concurrency_status()
         }
         
     except Exception as e:
@@ -31,12 +31,24 @@ from app.services.request_cache import RequestCacheService
 setup_logging_from_env()
 logger = get_api_logger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Release pooled keep-alive connections held by the shared HTTP clients
+    from app.agents.primary_agent.base_service import close_service_client
+    from app.agents.model_providers import close_http_clients
+    await close_service_client()
+    await close_http_clients()
+
+
 app = FastAPI(
     title="Juniper API",
     description="API for Juniper application",
     version="1.0.0",
     docs_url="/docs",
     openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 @app.middleware("http")
@@ -4,6 +4,7 @@ Email Service
 Service for sending emails with PDF attachments using Gmail SMTP.
 """
 
+import asyncio
 import os
 import smtplib
 import logging
@@ -53,6 +54,19 @@ class EmailService:
         pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         return bool(re.match(pattern, email))
 
+    def _send_message(self, msg: MIMEMultipart) -> None:
+        """Send a message over SMTP (blocking)."""
+        # Use SMTP_SSL for port 465, SMTP with STARTTLS for 587
+        if self.smtp_port == 465:
+            with smtplib.SMTP_SSL(self.smtp_host, self.smtp_port) as server:
+                server.login(self.smtp_user, self.smtp_password)
+                server.send_message(msg)
+        else:
+            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
+                server.starttls()
+                server.login(self.smtp_user, self.smtp_password)
+                server.send_message(msg)
+
     async def send_email_with_pdf(
         self,
         recipient_email: str,
@@ -131,16 +145,8 @@ class EmailService:
                 supabase=supabase
             )
 
-            # Send the email - use SMTP_SSL for port 465, SMTP with STARTTLS for 587
-            if self.smtp_port == 465:
-                with smtplib.SMTP_SSL(self.smtp_host, self.smtp_port) as server:
-                    server.login(self.smtp_user, self.smtp_password)
-                    server.send_message(msg)
-            else:
-                with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                    server.starttls()
-                    server.login(self.smtp_user, self.smtp_password)
-                    server.send_message(msg)
+            # smtplib blocks on the network; keep it off the event loop
+            await asyncio.to_thread(self._send_message, msg)
 
             logger.info(f"Successfully sent email to {recipient_email}")
 
@@ -5,10 +5,13 @@ Service for generating PDF documents from content.
 Uses ReportLab for PDF creation.
 """
 
+import asyncio
 import io
 import logging
+import re
 import time
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
 from uuid import UUID, uuid4
 from datetime import datetime
 
@@ -21,8 +24,20 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 
 from supabase import Client as SupabaseClient
 
+from app.config import PDF_BYTES_CACHE_MAX_MB
+
 logger = logging.getLogger(__name__)
 
+# Anything other than letters, digits, space, '-' and '_' (\w is Unicode-aware, like str.isalnum)
+_UNSAFE_TITLE_CHARS_RE = re.compile(r'[^\w \-]+')
+
+# Downloaded PDFs are immutable, so repeat fetches within a session are served
+# from memory for a short while instead of going back to storage. Bounded by both
+# entry count and total size, since a single PDF can be several MB
+_PDF_BYTES_CACHE_SIZE = 64
+_PDF_BYTES_CACHE_MAX_BYTES = PDF_BYTES_CACHE_MAX_MB * 1024 * 1024
+_PDF_BYTES_CACHE_TTL = 300.0  # seconds
+
 
 class PDFGeneratorService:
     """
@@ -35,6 +50,9 @@ class PDFGeneratorService:
         """Initialize the PDF generator service."""
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
+        # (pdf_id, user_id) -> (expires_at, pdf_bytes), least recently used first
+        self._pdf_bytes_cache: "OrderedDict[Tuple[str, str], Tuple[float, bytes]]" = OrderedDict()
+        self._pdf_bytes_cache_bytes = 0  # Sum of len(pdf_bytes) over the cached entries
         logger.info("Initialized PDF generator service")
 
     def _setup_custom_styles(self) -> None:
@@ -258,18 +276,19 @@ class PDFGeneratorService:
             Dictionary with pdf_id, storage_path, and success status
         """
         try:
-            # Generate the PDF
-            pdf_bytes = self.generate_pdf(title, content, content_type)
+            # Generate the PDF (reportlab rendering is CPU-bound; run it off the event loop)
+            pdf_bytes = await asyncio.to_thread(self.generate_pdf, title, content, content_type)
 
             # Create unique filename
             pdf_id = uuid4()
-            safe_title = "".join(c for c in title if c.isalnum() or c in (' ', '-', '_')).rstrip()
+            safe_title = _UNSAFE_TITLE_CHARS_RE.sub('', title).rstrip()
             safe_title = safe_title[:50]  # Limit length
             filename = f"{safe_title}_{pdf_id}.pdf"
             storage_path = f"generated_pdfs/{user_id}/{filename}"
 
             # Upload to Supabase storage
-            upload_result = supabase.storage.from_('pdfs').upload(
+            upload_result = await asyncio.to_thread(
+                supabase.storage.from_('pdfs').upload,
                 storage_path,
                 pdf_bytes,
                 file_options={"content-type": "application/pdf"}
@@ -358,7 +377,8 @@ class PDFGeneratorService:
         self,
         pdf_id: str,
         user_id: str,
-        supabase: SupabaseClient
+        supabase: SupabaseClient,
+        storage_path: Optional[str] = None
     ) -> Optional[bytes]:
         """
         Download PDF bytes from storage.
@@ -367,24 +387,43 @@ class PDFGeneratorService:
             pdf_id: ID of the generated PDF
             user_id: User ID for verification
             supabase: Supabase client
+            storage_path: Storage path from an already-fetched PDF record;
+                skips the metadata lookup when given
+
+        Recently downloaded PDFs are served from an in-process cache.
 
         Returns:
             PDF bytes or None if not found
         """
+        cache_key = (pdf_id, user_id)
+        cached = self._pdf_bytes_cache.get(cache_key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._pdf_bytes_cache.move_to_end(cache_key)
+                return cached[1]
+            del self._pdf_bytes_cache[cache_key]
+            self._pdf_bytes_cache_bytes -= len(cached[1])
+
         try:
-            # Get the PDF record
-            result = supabase.from_('generated_pdfs').select('storage_path').eq(
-                'id', pdf_id
-            ).eq('user_id', user_id).execute()
+            if storage_path is None:
+                # Get the PDF record
+                result = await asyncio.to_thread(
+                    supabase.from_('generated_pdfs').select('storage_path').eq(
+                        'id', pdf_id
+                    ).eq('user_id', user_id).execute
+                )
 
-            if not result.data:
-                logger.warning(f"PDF {pdf_id} not found for user {user_id}")
-                return None
+                if not result.data:
+                    logger.warning(f"PDF {pdf_id} not found for user {user_id}")
+                    return None
 
-            storage_path = result.data[0]['storage_path']
+                storage_path = result.data[0]['storage_path']
 
             # Download the file
-            pdf_bytes = supabase.storage.from_('pdfs').download(storage_path)
+            pdf_bytes = await asyncio.to_thread(supabase.storage.from_('pdfs').download, storage_path)
+
+            if pdf_bytes:
+                self._cache_pdf_bytes(cache_key, pdf_bytes)
 
             return pdf_bytes
 
@@ -393,5 +432,23 @@ class PDFGeneratorService:
             return None
 
 
+    def _cache_pdf_bytes(self, cache_key: Tuple[str, str], pdf_bytes: bytes) -> None:
+        """Store downloaded PDF bytes, evicting least recently used entries beyond the count and size limits."""
+        if len(pdf_bytes) > _PDF_BYTES_CACHE_MAX_BYTES:
+            return
+
+        previous = self._pdf_bytes_cache.pop(cache_key, None)
+        if previous is not None:
+            self._pdf_bytes_cache_bytes -= len(previous[1])
+
+        self._pdf_bytes_cache[cache_key] = (time.monotonic() + _PDF_BYTES_CACHE_TTL, pdf_bytes)
+        self._pdf_bytes_cache_bytes += len(pdf_bytes)
+
+        while (len(self._pdf_bytes_cache) > _PDF_BYTES_CACHE_SIZE
+               or self._pdf_bytes_cache_bytes > _PDF_BYTES_CACHE_MAX_BYTES):
+            _, (_, evicted) = self._pdf_bytes_cache.popitem(last=False)
+            self._pdf_bytes_cache_bytes -= len(evicted)
+
+
 # Global instance
 pdf_generator_service = PDFGeneratorService()
@@ -411,7 +411,7 @@ class PDFProcessor:
                                 image_data_url = self._pil_image_to_data_url(page_images[0])
 
                                 # Use vision processing to extract text
-                                vision_text = process_image_with_vision(
+                                vision_text = await process_image_with_vision(
                                     user_message="Extract all text from this document page. Preserve formatting and structure.",
                                     image_url=image_data_url
                                 )
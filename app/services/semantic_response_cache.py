@@ -0,0 +1,110 @@
+"""
+Semantic Response Cache Service
+
+In-process cache of model responses keyed by prompt embeddings.
+Serves a previous response when a new prompt is semantically equivalent
+(cosine similarity above a threshold) within the same conversation scope.
+"""
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from app.config import (
+    SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_TTL_MINUTES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticResponseCache:
+    """
+    Cache of model responses looked up by embedding similarity.
+
+    Entries are grouped by scope (a hash of everything in the prompt except the
+    last user message), so only reformulations of the same turn can hit.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl: timedelta = timedelta(minutes=SEMANTIC_CACHE_TTL_MINUTES)
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # scope -> list of (unit-normalized embedding, response, stored_at)
+        self._entries: "OrderedDict[str, List[Tuple[List[float], str, datetime]]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in embedding))
+        return [x / norm for x in embedding] if norm else embedding
+
+    def get(self, scope: str, embedding: List[float]) -> Optional[str]:
+        """
+        Return the best cached response for the scope above the similarity threshold.
+
+        Args:
+            scope: Conversation scope key
+            embedding: Embedding of the last user message
+
+        Returns:
+            The cached response or None on a miss
+        """
+        query = self._normalize(embedding)
+        cutoff = datetime.now() - self.ttl
+
+        with self._lock:
+            entries = self._entries.get(scope)
+            if not entries:
+                return None
+
+            live = [entry for entry in entries if entry[2] >= cutoff]
+            self._size -= len(entries) - len(live)
+            if not live:
+                del self._entries[scope]
+                return None
+            self._entries[scope] = live
+
+            best_score, best_response = -1.0, None
+            for cached_embedding, response, _ in live:
+                score = sum(a * b for a, b in zip(query, cached_embedding))
+                if score > best_score:
+                    best_score, best_response = score, response
+
+        if best_score >= self.similarity_threshold:
+            logger.debug(f"Semantic cache hit (similarity {best_score:.3f})")
+            return best_response
+        return None
+
+    def put(self, scope: str, embedding: List[float], response: str) -> None:
+        """
+        Store a response for the scope.
+
+        Args:
+            scope: Conversation scope key
+            embedding: Embedding of the last user message
+            response: Model response to cache
+        """
+        with self._lock:
+            self._entries.setdefault(scope, []).append((self._normalize(embedding), response, datetime.now()))
+            self._entries.move_to_end(scope)
+            self._size += 1
+
+            # Evict least recently written scopes once over capacity
+            while self._size > self.max_entries and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+# Global instance for use across the application
+semantic_response_cache = SemanticResponseCache()
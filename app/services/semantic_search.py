@@ -129,6 +129,21 @@ class SemanticSearchService:
             })
             raise RuntimeError(f"Failed to generate query embedding: {str(e)}")
     
+    def generate_query_embedding(self, text: str) -> List[float]:
+        """
+        Generate an embedding for query text, compatible with stored resource embeddings.
+        
+        Args:
+            text: Query text to embed
+            
+        Returns:
+            List of floats representing the embedding vector
+            
+        Raises:
+            RuntimeError: If the embedding request fails
+        """
+        return self._generate_query_embedding(text)
+    
     def batch_generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         DEPRECATED: Batch embedding generation is now handled by Supabase Edge Functions.
@@ -13,7 +13,7 @@ from app.utils.logging.component_loggers import get_api_logger
 
 logger = get_api_logger(__name__)
 
-def process_image_with_vision(user_message: str, image_url: str) -> Optional[str]:
+async def process_image_with_vision(user_message: str, image_url: str) -> Optional[str]:
     """
     Process an image using vision-capable LLM to extract relevant information 
     based on the user's request.
@@ -52,7 +52,7 @@ def process_image_with_vision(user_message: str, image_url: str) -> Optional[str
                 continue
             
             # Process image with vision model
-            extracted_info = provider.generate_vision_response(
+            extracted_info = await provider.generate_vision_response(
                 text_prompt=system_prompt,
                 image_url=image_url,
                 temperature=0.1
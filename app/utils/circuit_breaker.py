@@ -1,5 +1,5 @@
 """
-Circuit breaker pattern for Supabase operations
+Circuit breaker pattern for Supabase operations and model providers
 """
 
 import time
@@ -38,7 +38,8 @@ class CircuitBreaker:
         failure_threshold: int = 5,
         recovery_timeout: int = 30,
         expected_exception: type = Exception,
-        name: str = "default"
+        name: str = "default",
+        is_failure: Optional[Callable[[Exception], bool]] = None
     ):
         """
         Initialize circuit breaker.
@@ -48,11 +49,13 @@ class CircuitBreaker:
             recovery_timeout: Seconds to wait before trying again
             expected_exception: Exception type to catch
             name: Name for logging and monitoring
+            is_failure: Optional predicate; expected exceptions it rejects are re-raised without counting
         """
         self.failure_threshold = failure_threshold
         self.recovery_timeout = recovery_timeout
         self.expected_exception = expected_exception
         self.name = name
+        self.is_failure = is_failure
         
         self._state = CircuitState.CLOSED
         self._stats = CircuitBreakerStats()
@@ -89,6 +92,31 @@ class CircuitBreaker:
                 f"Circuit breaker '{self.name}' state changed: {old_state.value} -> {new_state.value}"
             )
     
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently being rejected (open and still within the recovery timeout)"""
+        return self._state == CircuitState.OPEN and not self._should_attempt_reset()
+    
+    def _before_call(self) -> None:
+        """Reject the call while open, or move to half-open once the recovery timeout has passed"""
+        with self._lock:
+            current_state = self._state
+        
+        # Check if circuit is open
+        if current_state == CircuitState.OPEN:
+            if self._should_attempt_reset():
+                # Try to transition to half-open
+                with self._lock:
+                    if self._state == CircuitState.OPEN:  # Double-check
+                        self._change_state(CircuitState.HALF_OPEN)
+            else:
+                # Circuit is open and not ready for retry
+                raise CircuitBreakerOpenException(
+                    f"Circuit breaker '{self.name}' is OPEN. "
+                    f"Last failure: {time.time() - self._stats.last_failure_time:.1f}s ago. "
+                    f"Will retry in {self.recovery_timeout - (time.time() - self._stats.last_failure_time):.1f}s"
+                )
+    
     def _should_attempt_reset(self) -> bool:
         """Check if circuit should attempt to reset"""
         return (
@@ -108,6 +136,9 @@ class CircuitBreaker:
                 self._stats.failure_count = 0  # Reset failure count
                 self._change_state(CircuitState.CLOSED)
                 logger.info(f"Circuit breaker '{self.name}' reset to CLOSED after successful call")
+            elif self._state == CircuitState.CLOSED:
+                # Only consecutive failures should open the circuit
+                self._stats.failure_count = 0
     
     def _record_failure(self, exception: Exception) -> None:
         """Record failed operation"""
@@ -160,24 +191,7 @@ class CircuitBreaker:
             CircuitBreakerOpenException: When circuit is open
             Original exception: When function fails
         """
-        with self._lock:
-            current_state = self._state
-        
-        # Check if circuit is open
-        if current_state == CircuitState.OPEN:
-            if self._should_attempt_reset():
-                # Try to transition to half-open
-                with self._lock:
-                    if self._state == CircuitState.OPEN:  # Double-check
-                        self._change_state(CircuitState.HALF_OPEN)
-                        current_state = CircuitState.HALF_OPEN
-            else:
-                # Circuit is open and not ready for retry
-                raise CircuitBreakerOpenException(
-                    f"Circuit breaker '{self.name}' is OPEN. "
-                    f"Last failure: {time.time() - self._stats.last_failure_time:.1f}s ago. "
-                    f"Will retry in {self.recovery_timeout - (time.time() - self._stats.last_failure_time):.1f}s"
-                )
+        self._before_call()
         
         # Execute the function with monitoring
         start_time = time.time()
@@ -221,6 +235,40 @@ class CircuitBreaker:
             logger.error(f"Circuit breaker '{self.name}' caught unexpected exception: {e}")
             raise
 
+    async def call_async(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Await a coroutine function with circuit breaker protection.
+        
+        Args:
+            func: Coroutine function to execute
+            *args, **kwargs: Function arguments
+            
+        Returns:
+            Function result
+            
+        Raises:
+            CircuitBreakerOpenException: When circuit is open
+            Original exception: When function fails
+        """
+        self._before_call()
+        
+        try:
+            result = await func(*args, **kwargs)
+        except self.expected_exception as e:
+            if self.is_failure is None or self.is_failure(e):
+                self._record_failure(e)
+            raise
+        
+        self._record_success()
+        return result
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get state and statistics of this circuit breaker"""
+        return {
+            "state": self.state.value,
+            "stats": self.stats.__dict__
+        }
+
 class CircuitBreakerOpenException(Exception):
     """Exception raised when circuit breaker is open"""
     pass
@@ -116,7 +116,7 @@ async def classify_service_types(
         ]
 
         # Get classification from the model
-        response = provider.generate_response(messages, LLM_CLASSIFIER_TEMPERATURE)
+        response = await provider.generate_response(messages, LLM_CLASSIFIER_TEMPERATURE)
 
         # Parse the response
         try:
@@ -0,0 +1,25 @@
+-- Add a batched variant of increment_request_turns
+-- Agents accumulate turn increments in-process and apply them with one RPC
+-- instead of one round-trip per action. Delegates to increment_request_turns
+-- so the existing counting/validation logic stays the single source of truth.
+
+CREATE OR REPLACE FUNCTION increment_request_turns_by(
+    request_id_param TEXT,
+    n_param INTEGER
+)
+RETURNS INTEGER AS $$
+DECLARE
+    turn_count INTEGER := -1;
+BEGIN
+    FOR i IN 1..GREATEST(n_param, 0) LOOP
+        turn_count := increment_request_turns(request_id_param);
+
+        -- Stop early if the underlying increment reports failure
+        IF turn_count = -1 THEN
+            RETURN -1;
+        END IF;
+    END LOOP;
+
+    RETURN turn_count;
+END;
+$$ LANGUAGE plpgsql;
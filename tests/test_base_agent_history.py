@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Unit tests for BaseAgent history trimming.
+Runs offline: the model provider is replaced by a canned responder.
+"""
+
+import os
+import sys
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-test")
+
+from app.agents.base_agent import BaseAgent
+from app.agents.model_providers import ModelProvider
+from app.agents.models import Action, Message
+
+
+class CannedProvider(ModelProvider):
+    """Returns a fixed response and records the messages it was sent."""
+
+    def __init__(self, response: str):
+        self.response = response
+        self.sent = []
+
+    async def generate_response(self, messages, temperature):
+        self.sent.append(list(messages))
+        return self.response
+
+
+async def noop_handler(input_str: str) -> str:
+    return ""
+
+
+def make_agent(history, max_history):
+    action = Action(
+        name="noop",
+        description="Does nothing",
+        parameters={},
+        returns="Nothing",
+        handler=noop_handler
+    )
+    agent = BaseAgent(
+        actions=[action],
+        additional_context="Test context",
+        model="claude-haiku-4-5",
+        messages=history,
+        max_history=max_history
+    )
+    agent.model_provider = CannedProvider('{"thought": "t", "type": "response", "response": "done"}')
+    return agent
+
+
+def alternating_history(count):
+    return [
+        Message(role="user" if i % 2 == 0 else "assistant", content=f"m{i}", type="text")
+        for i in range(count)
+    ]
+
+
+def content(msg):
+    value = msg["content"]
+    return value if isinstance(value, str) else value[0]["text"]
+
+
+def test_trim_keeps_history_starting_on_user_turn():
+    agent = make_agent(alternating_history(10), max_history=5)
+    agent._trim_history()
+
+    roles = [msg["role"] for msg in agent.messages]
+    assert len(agent.messages) <= 5
+    assert roles[0] == "user"
+    assert [content(msg) for msg in agent.messages] == ["m6", "m7", "m8", "m9"]
+
+
+def test_trim_never_drops_system_messages():
+    agent = make_agent(alternating_history(6), max_history=3)
+    agent._install_system_prompt()
+    agent.messages.append({"role": "user", "content": "new"})
+    agent._trim_history()
+
+    assert agent.messages[0]["role"] == "system"
+    assert agent.messages[1]["role"] == "user"
+
+
+def test_lazy_system_prompt_lands_at_history_boundary_after_trim():
+    agent = make_agent(alternating_history(10), max_history=4)
+    asyncio.run(agent.query([Message(role="user", content="hi", type="text")], "user-1", None, None))
+
+    sent = agent.model_provider.sent[0]
+    roles = [msg["role"] for msg in sent]
+    assert roles == ["user", "assistant", "system", "user"]
+    assert [content(msg) for msg in sent if msg["role"] != "system"] == ["m8", "m9", "hi"]
+
+
+if __name__ == "__main__":
+    test_trim_keeps_history_starting_on_user_turn()
+    test_trim_never_drops_system_messages()
+    test_lazy_system_prompt_lands_at_history_boundary_after_trim()
+    print("All history trimming tests passed")
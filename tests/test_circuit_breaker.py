@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Unit tests for CircuitBreaker.call_async as used by the model providers.
+"""
+
+import os
+import sys
+import asyncio
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.model_providers import _is_retryable_error
+from app.utils.circuit_breaker import CircuitBreaker, CircuitBreakerOpenException, CircuitState
+
+
+def status_error(status_code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.example.com/v1/messages")
+    response = httpx.Response(status_code, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status_code}", request=request, response=response)
+
+
+def make_breaker(threshold: int = 3) -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_threshold=threshold,
+        recovery_timeout=30,
+        name="test_provider",
+        is_failure=_is_retryable_error
+    )
+
+
+async def fail_with(error: Exception):
+    raise error
+
+
+async def succeed():
+    return "ok"
+
+
+def call(breaker: CircuitBreaker, func, *args):
+    return asyncio.run(breaker.call_async(func, *args))
+
+
+def call_failing(breaker: CircuitBreaker, error: Exception) -> None:
+    try:
+        call(breaker, fail_with, error)
+    except type(error):
+        pass
+
+
+def test_opens_after_threshold_consecutive_retryable_failures():
+    breaker = make_breaker(threshold=3)
+
+    call_failing(breaker, status_error(503))
+    call_failing(breaker, status_error(502))
+    assert breaker.state == CircuitState.CLOSED
+
+    call_failing(breaker, httpx.ConnectTimeout("timed out"))
+    assert breaker.state == CircuitState.OPEN
+
+    try:
+        call(breaker, succeed)
+        assert False, "open breaker should reject calls"
+    except CircuitBreakerOpenException:
+        pass
+
+
+def test_success_resets_consecutive_failure_count():
+    breaker = make_breaker(threshold=3)
+
+    call_failing(breaker, status_error(503))
+    call_failing(breaker, status_error(503))
+    assert call(breaker, succeed) == "ok"
+    call_failing(breaker, status_error(503))
+    call_failing(breaker, status_error(503))
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.stats.failure_count == 2
+
+
+def test_client_errors_never_open_the_circuit():
+    breaker = make_breaker(threshold=2)
+
+    for status_code in (400, 401, 404, 422, 400):
+        call_failing(breaker, status_error(status_code))
+
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.stats.failure_count == 0
+    assert call(breaker, succeed) == "ok"
+
+
+def test_rate_limits_count_as_failures():
+    breaker = make_breaker(threshold=2)
+
+    call_failing(breaker, status_error(429))
+    call_failing(breaker, status_error(429))
+
+    assert breaker.state == CircuitState.OPEN
+
+
+if __name__ == "__main__":
+    test_opens_after_threshold_consecutive_retryable_failures()
+    test_success_resets_consecutive_failure_count()
+    test_client_errors_never_open_the_circuit()
+    test_rate_limits_count_as_failures()
+    print("All circuit breaker tests passed")
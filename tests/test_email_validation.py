@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Unit tests for recipient email validation in the email_pdf tool.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.tools import validate_emails
+from app.agents.tools.email_pdf import _validate_email
+
+
+VALID = ["a@b.co", "john.doe+pdf@example.com", "x_y-z%1@mail.example.org"]
+INVALID = [
+    "",
+    "a@b.c",          # TLD too short
+    "plainaddress",
+    "@example.com",
+    "user@",
+    "user@example",
+    "us er@example.com",
+    "a@b@example.com",
+    "user@example.com\n",
+]
+
+
+def test_single_address_validation():
+    for email in VALID:
+        assert _validate_email(email), email
+    for email in INVALID:
+        assert not _validate_email(email), email
+
+
+def test_batch_matches_single_validation_in_order():
+    emails = [VALID[0], INVALID[2], VALID[1], INVALID[-1], VALID[2]]
+    assert validate_emails(emails) == [True, False, True, False, True]
+
+
+def test_batch_accepts_any_iterable():
+    assert validate_emails(email for email in VALID) == [True] * len(VALID)
+    assert validate_emails([]) == []
+
+
+if __name__ == "__main__":
+    test_single_address_validation()
+    test_batch_matches_single_validation_in_order()
+    test_batch_accepts_any_iterable()
+    print("All email validation tests passed")
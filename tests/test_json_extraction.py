@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Unit tests for extracting the JSON block from model responses.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "sk-ant-test")
+
+from app.agents.base_agent import BaseAgent, _find_json_object
+from app.agents.models import Action
+
+
+async def noop_handler(input_str: str) -> str:
+    return ""
+
+
+def make_agent() -> BaseAgent:
+    action = Action(
+        name="noop",
+        description="Does nothing",
+        parameters={},
+        returns="Nothing",
+        handler=noop_handler
+    )
+    return BaseAgent(actions=[action], additional_context="Test context", model="claude-haiku-4-5")
+
+
+def test_find_balanced_object():
+    assert _find_json_object('{"a": {"b": 1}}') == '{"a": {"b": 1}}'
+
+
+def test_find_object_embedded_in_prose():
+    text = 'Sure, here it is: {"type": "response", "response": "hi"} Let me know.'
+    assert _find_json_object(text) == '{"type": "response", "response": "hi"}'
+
+
+def test_find_object_ignores_braces_inside_strings():
+    text = 'prefix {"response": "use } and { freely", "n": {"x": "\\"}"}} suffix }'
+    assert _find_json_object(text) == '{"response": "use } and { freely", "n": {"x": "\\"}"}}'
+
+
+def test_find_object_unbalanced_returns_none():
+    assert _find_json_object('{"a": {"b": 1}') is None
+    assert _find_json_object('no json here') is None
+
+
+def test_extract_plain_json():
+    agent = make_agent()
+    assert agent._extract_json_string('  {"type": "response"}  ') == '{"type": "response"}'
+
+
+def test_extract_fenced_json():
+    agent = make_agent()
+    result = '```json\n{"type": "response", "response": "hi"}\n```'
+    assert agent._extract_json_string(result) == '{"type": "response", "response": "hi"}'
+
+
+def test_extract_embedded_json_is_decoded():
+    agent = make_agent()
+    result = 'I will answer now. {"type": "response", "response": "a } brace"} Done.'
+    assert agent._extract_json_string(result) == {"type": "response", "response": "a } brace"}
+
+
+def test_extract_malformed_embedded_json_returns_balanced_span():
+    agent = make_agent()
+    result = 'Answer: {"type": "response", "response": "x",} trailing'
+    assert agent._extract_json_string(result) == '{"type": "response", "response": "x",}'
+
+
+def test_extract_without_json_raises():
+    agent = make_agent()
+    try:
+        agent._extract_json_string("just prose")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_find_balanced_object()
+    test_find_object_embedded_in_prose()
+    test_find_object_ignores_braces_inside_strings()
+    test_find_object_unbalanced_returns_none()
+    test_extract_plain_json()
+    test_extract_fenced_json()
+    test_extract_embedded_json_is_decoded()
+    test_extract_malformed_embedded_json_returns_balanced_span()
+    test_extract_without_json_raises()
+    print("All JSON extraction tests passed")
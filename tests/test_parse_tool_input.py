@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Unit tests for parse_tool_input in the service helpers.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agents.primary_agent.base_service import parse_tool_input
+
+
+def test_empty_input():
+    assert parse_tool_input("") == {}
+
+
+def test_json_object():
+    assert parse_tool_input('{"query": "CD-150", "max_results": 5}') == {"query": "CD-150", "max_results": 5}
+
+
+def test_json_scalars_decode_as_json():
+    assert parse_tool_input('"hello"') == "hello"
+    assert parse_tool_input("123") == 123
+    assert parse_tool_input("null") is None
+
+
+def test_key_value_pairs():
+    assert parse_tool_input("query=weather, model=sonar") == {"query": "weather", "model": "sonar"}
+
+
+def test_key_value_quoted_values_keep_commas():
+    result = parse_tool_input('query="weather, today", model=\'sonar, pro\', mode=fast')
+    assert result == {"query": "weather, today", "model": "sonar, pro", "mode": "fast"}
+
+
+def test_key_value_value_may_contain_equals():
+    assert parse_tool_input("filter=a=b") == {"filter": "a=b"}
+
+
+def test_key_value_empty_value():
+    assert parse_tool_input("query=, model=sonar") == {"query": "", "model": "sonar"}
+
+
+def test_invalid_json_falls_back_to_key_value():
+    assert parse_tool_input("{not json") == {}
+
+
+if __name__ == "__main__":
+    test_empty_input()
+    test_json_object()
+    test_json_scalars_decode_as_json()
+    test_key_value_pairs()
+    test_key_value_quoted_values_keep_commas()
+    test_key_value_value_may_contain_equals()
+    test_key_value_empty_value()
+    test_invalid_json_falls_back_to_key_value()
+    print("All parse_tool_input tests passed")
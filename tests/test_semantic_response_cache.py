@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the in-process semantic response cache.
+"""
+
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.semantic_response_cache import SemanticResponseCache
+
+
+def test_hit_at_or_above_threshold():
+    cache = SemanticResponseCache(similarity_threshold=0.95)
+    cache.put("scope", [1.0, 0.0], "cached answer")
+
+    # Scale does not matter, only direction
+    assert cache.get("scope", [10.0, 0.0]) == "cached answer"
+    # cos ~= 0.995
+    assert cache.get("scope", [1.0, 0.1]) == "cached answer"
+
+
+def test_miss_below_threshold():
+    cache = SemanticResponseCache(similarity_threshold=0.95)
+    cache.put("scope", [1.0, 0.0], "cached answer")
+
+    # cos ~= 0.894
+    assert cache.get("scope", [1.0, 0.5]) is None
+    assert cache.get("scope", [0.0, 1.0]) is None
+
+
+def test_returns_most_similar_entry():
+    cache = SemanticResponseCache(similarity_threshold=0.9)
+    cache.put("scope", [1.0, 0.0], "first")
+    cache.put("scope", [1.0, 0.3], "second")
+
+    assert cache.get("scope", [1.0, 0.28]) == "second"
+
+
+def test_scopes_are_isolated():
+    cache = SemanticResponseCache(similarity_threshold=0.95)
+    cache.put("scope-a", [1.0, 0.0], "answer a")
+
+    assert cache.get("scope-b", [1.0, 0.0]) is None
+
+
+def test_entries_expire_after_ttl():
+    cache = SemanticResponseCache(similarity_threshold=0.95, ttl=timedelta(milliseconds=20))
+    cache.put("scope", [1.0, 0.0], "cached answer")
+    assert cache.get("scope", [1.0, 0.0]) == "cached answer"
+
+    time.sleep(0.05)
+    assert cache.get("scope", [1.0, 0.0]) is None
+
+
+def test_least_recently_written_scope_is_evicted():
+    cache = SemanticResponseCache(similarity_threshold=0.95, max_entries=2)
+    cache.put("old", [1.0, 0.0], "old answer")
+    cache.put("middle", [1.0, 0.0], "middle answer")
+    cache.put("old", [0.0, 1.0], "old answer 2")  # Writing moves the scope to the back
+    cache.put("new", [1.0, 0.0], "new answer")
+
+    # Evicting the least recently written scope drops "middle" first; "old" still
+    # holds two entries, so it goes too once the cache is over capacity
+    assert cache.get("middle", [1.0, 0.0]) is None
+    assert cache.get("old", [1.0, 0.0]) is None
+    assert cache.get("new", [1.0, 0.0]) == "new answer"
+
+
+if __name__ == "__main__":
+    test_hit_at_or_above_threshold()
+    test_miss_below_threshold()
+    test_returns_most_similar_entry()
+    test_scopes_are_isolated()
+    test_entries_expire_after_ttl()
+    test_least_recently_written_scope_is_evicted()
+    print("All semantic response cache tests passed")